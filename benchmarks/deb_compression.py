@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+deb 压缩配置基准
+
+将已构建的 deb(如 dist/*.deb)用不同的 dpkg-deb 压缩参数重新打包, 对比:
+    - 打包耗时(dh_builddeb 的主要开销)
+    - deb 大小(传输到机器人的开销)
+    - 解包耗时(dpkg-deb -x, 近似安装时的解压开销)
+
+不支持的算法(如旧版 dpkg 的 zstd)会被跳过.
+
+用法:
+    python3 benchmarks/deb_compression.py dist/*.deb
+    python3 benchmarks/deb_compression.py --runs 3 dist/*.deb
+"""
+import argparse
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO.joinpath("scripts")))
+
+from gen_deb import BUILD_PROFILES  # noqa: E402
+
+CANDIDATES = {
+    "none": ["-Znone"],
+    "gzip -1": ["-Zgzip", "-z1"],
+    "gzip -9": ["-Zgzip", "-z9"],
+    "zstd -1": ["-Zzstd", "-z1"],
+    "zstd -19": ["-Zzstd", "-z19"],
+    "xz -6 (default)": ["-Zxz", "-z6"],
+    **{f"{name} profile": profile.builddeb_args() for name, profile in BUILD_PROFILES.items()},
+}
+
+
+def timed_run(cmd) -> float:
+    start = time.perf_counter()
+    subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    return time.perf_counter() - start
+
+
+def measure(trees, args, runs: int, tmp: Path) -> dict:
+    pack, unpack, size = [], [], 0
+    for tree in trees:
+        deb = tmp.joinpath(tree.name + ".deb")
+        pack.append(statistics.median(timed_run(["dpkg-deb", *args, "-b", str(tree), str(deb)]) for _ in range(runs)))
+        size += deb.stat().st_size
+        out = tmp.joinpath("x")
+        out.mkdir()
+        unpack.append(statistics.median(timed_run(["dpkg-deb", "-x", str(deb), str(out.joinpath(str(i)))])
+                                        for i in range(runs)))
+        shutil.rmtree(out)
+        deb.unlink()
+    return {"pack": sum(pack), "unpack": sum(unpack), "size": size}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("debs", nargs="+", help="参与对比的 deb")
+    parser.add_argument("--runs", type=int, default=1, help="每项测量的次数, 取中位数")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        trees = []
+        for deb in args.debs:
+            tree = tmp.joinpath(Path(deb).stem)
+            subprocess.run(["dpkg-deb", "-R", deb, str(tree)], check=True)
+            trees.append(tree)
+
+        print(f"{'compression':<24}{'pack':>10}{'unpack':>10}{'size':>12}")
+        for name, candidate in CANDIDATES.items():
+            try:
+                result = measure(trees, candidate, args.runs, tmp)
+            except subprocess.CalledProcessError as e:
+                print(f"{name:<24}  skipped: {e.stderr.decode().strip().splitlines()[-1]}")
+                continue
+            print(f"{name:<24}{result['pack']:>9.2f}s{result['unpack']:>9.2f}s{result['size'] / 1024:>11.0f}K")
+
+
+if __name__ == "__main__":
+    main()
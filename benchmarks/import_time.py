@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+gen_deb 启动耗时基准
+
+对比指定 git 版本(baseline)与当前工作区的 scripts/gen_deb.py:
+    - python -X importtime 统计的 gen_deb 模块导入耗时(累计, 含依赖)
+    - gen_deb --help 的端到端耗时
+
+baseline 默认为引入延迟导入(_Lazy)之前的版本, 由 git log -S 按内容查找, 不受 rebase/squash 影响
+
+用法:
+    python3 benchmarks/import_time.py                     # 与延迟导入之前的版本对比
+    python3 benchmarks/import_time.py --baseline HEAD~1 --runs 20
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO = Path(__file__).resolve().parent.parent
+SCRIPT = "scripts/gen_deb.py"
+
+
+def import_time_us(script_dir: Path, env: dict) -> int:
+    """返回 gen_deb 模块的累计导入耗时(微秒)"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import gen_deb"],
+                            cwd=script_dir, env=env, stderr=subprocess.PIPE, stdout=subprocess.DEVNULL, text=True)
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        parts = [part.strip() for part in line.split("|")]
+        if len(parts) == 3 and parts[2] == "gen_deb":
+            return int(parts[1])
+    raise RuntimeError(f"gen_deb 导入失败:\n{result.stderr[-2000:]}")
+
+
+def help_time_s(script: Path, env: dict) -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, str(script), "--help"], env=env,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def measure(script: Path, runs: int, env: dict) -> dict:
+    imports = [import_time_us(script.parent, env) for _ in range(runs)]
+    helps = [help_time_s(script, env) for _ in range(runs)]
+    return {"import_ms": statistics.median(imports) / 1000, "help_ms": statistics.median(helps) * 1000}
+
+
+def lazy_import_parent() -> str:
+    """引入 _Lazy 的提交的父提交"""
+    commits = subprocess.run(["git", "log", "-S", "class _Lazy", "--format=%h", "--", SCRIPT], cwd=REPO,
+                             check=True, stdout=subprocess.PIPE, text=True).stdout.split()
+    if not commits:
+        sys.exit("未找到引入延迟导入的提交, 请通过 --baseline 指定对比版本")
+    # git log 从新到旧输出, 最后一个为最早引入的提交
+    return f"{commits[-1]}^"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--baseline", default=None, help="对比的 git 版本, 默认为引入延迟导入之前的版本")
+    parser.add_argument("--runs", type=int, default=10, help="每项测量的次数, 取中位数")
+    args = parser.parse_args()
+    args.baseline = args.baseline or lazy_import_parent()
+
+    # 旧版本在导入时要求 ROS 环境, 未加载时补一个默认值
+    env = dict(os.environ, ROS_DISTRO=os.environ.get("ROS_DISTRO", "noetic"), PAGER="cat")
+    with tempfile.TemporaryDirectory() as tmp:
+        baseline = Path(tmp, "gen_deb.py")
+        baseline.write_bytes(subprocess.run(["git", "show", f"{args.baseline}:{SCRIPT}"], cwd=REPO,
+                                            check=True, stdout=subprocess.PIPE).stdout)
+        results = {
+            args.baseline: measure(baseline, args.runs, env),
+            "working tree": measure(REPO.joinpath(SCRIPT), args.runs, env),
+        }
+
+    print(f"{'version':<20}{'import gen_deb':>16}{'gen_deb --help':>16}")
+    for name, result in results.items():
+        print(f"{name:<20}{result['import_ms']:>13.1f}ms{result['help_ms']:>13.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,359 @@
 #!/usr/bin/env python3
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
-from plumbum import FG, local
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from plumbum import FG, ProcessExecutionError, local
 from plumbum.cmd import sudo, wget
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+import asyncio
 import requests
+import threading
+import json
+import time
+import fnmatch
+import hashlib
+import shutil
+import uuid
 import os
 import fire
 
 
+def cacheDir() -> Path:
+    """客户端缓存目录(会话、目录索引等), 可通过 CHFS_CACHE_DIR 修改"""
+    return Path(os.environ.get("CHFS_CACHE_DIR", "~/.cache/chfs")).expanduser()
+
+
+def sessionFile(ip: str, port: int, user: str) -> Path:
+    """会话 cookie 缓存文件, 同步与异步客户端共用"""
+    return cacheDir().joinpath(f"session-{ip}-{port}-{user}.json")
+
+
+class SessionCache:
+    """
+    本地缓存的会话 cookie, Chfs 与 AsyncChfs 共用
+
+    有效期取各 cookie 自身的过期时间与 ttl 中最早的一个, 过期后视为不存在
+    """
+
+    def __init__(self, ip: str, port: int, user: str, ttl: float) -> None:
+        self._path = sessionFile(ip, port, user)
+        self._ttl = ttl
+
+
+    def load(self) -> Optional[Dict[str, str]]:
+        """读取缓存的 cookie, 已过期或不存在时返回 None"""
+        try:
+            with open(self._path, "r", encoding="utf-8") as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if cache.get("expires", 0) <= time.time():
+            return None
+        return cache.get("cookies", {})
+
+
+    def save(self, cookies: List[Tuple[str, str, Optional[float]]]) -> None:
+        """
+        缓存会话 cookie
+
+        Args:
+            cookies (List[Tuple[str, str, Optional[float]]]): (名称, 值, 过期时间戳), 会话 cookie 的过期时间为 None
+        """
+        expires = min([time.time() + self._ttl] + [expiry for _, _, expiry in cookies if expiry])
+        try:
+            self._path.parent.mkdir(parents=True, exist_ok=True)
+            # 仅当前用户可读
+            fd = os.open(f"{self._path}.tmp", os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"cookies": {name: value for name, value, _ in cookies}, "expires": expires}, f)
+            os.replace(f"{self._path}.tmp", self._path)
+        except OSError as e:
+            print(f"缓存会话失败: {e}")
+
+
+    def clear(self) -> None:
+        try:
+            self._path.unlink()
+        except OSError:
+            pass
+
+
+class DirIndex:
+    """
+    远端目录索引, 缓存在 index-<ip>-<port>.json 中, Chfs 与 AsyncChfs 共用
+
+    目录路径 -> {"time": 获取时间, "entries": 条目列表}, 超过 ttl 的目录视为过期. 首次使用时从磁盘加载,
+    目录内容发生变化(上传、创建目录、删除)后需要调用 invalidate
+    """
+
+    def __init__(self, ip: str, port: int, ttl: float) -> None:
+        self._path = cacheDir().joinpath(f"index-{ip}-{port}.json")
+        self._ttl = ttl
+        self._index: Optional[Dict[str, dict]] = None
+        self._lock = threading.Lock()
+
+
+    @staticmethod
+    def normDir(path: str) -> str:
+        return "/" + path.strip("/")
+
+
+    @staticmethod
+    def parentDir(path: str) -> str:
+        return str(Path("/" + path.strip("/")).parent)
+
+
+    @staticmethod
+    def normalize(path: str, files: List[dict]) -> List[dict]:
+        """统一服务器返回的条目字段: 完整路径、大小、修改时间、是否目录"""
+        entries = []
+        for item in files:
+            item = dict(item)
+            item["path"] = f"{path.rstrip('/')}/{item.get('name')}"
+            item.setdefault("size", 0)
+            item.setdefault("mtime", item.get("time", item.get("modtime")))
+            item["dir"] = bool(item.get("dir", False))
+            entries.append(item)
+        return entries
+
+
+    def _load(self) -> Dict[str, dict]:
+        """调用方需持有 _lock"""
+        if self._index is None:
+            try:
+                with open(self._path, "r", encoding="utf-8") as f:
+                    self._index = json.load(f)
+            except (OSError, ValueError):
+                self._index = {}
+        return self._index
+
+
+    def get(self, path: str) -> Optional[List[dict]]:
+        """未过期的目录条目, 没有时返回 None"""
+        with self._lock:
+            cached = self._load().get(self.normDir(path))
+        if cached and time.time() - cached["time"] < self._ttl:
+            return cached["entries"]
+        return None
+
+
+    def put(self, path: str, entries: List[dict]) -> None:
+        with self._lock:
+            self._load()[self.normDir(path)] = {"time": time.time(), "entries": entries}
+
+
+    def save(self) -> None:
+        """写回磁盘, 同时丢弃过期的目录"""
+        with self._lock:
+            index = {path: item for path, item in self._load().items() if time.time() - item["time"] < self._ttl}
+            try:
+                self._path.parent.mkdir(parents=True, exist_ok=True)
+                with open(f"{self._path}.tmp", "w", encoding="utf-8") as f:
+                    json.dump(index, f)
+                os.replace(f"{self._path}.tmp", self._path)
+            except OSError as e:
+                print(f"保存目录索引失败: {e}")
+
+
+    def invalidate(self, *paths: str) -> None:
+        """使目录的索引失效, 磁盘上的索引同时更新"""
+        with self._lock:
+            index = self._load()
+            removed = [index.pop(self.normDir(path), None) for path in paths]
+        if any(removed):
+            self.save()
+
+
+class RemoteChangedError(IOError):
+    """断点续传过程中远端文件发生了变化"""
+
+
+class MultipartFileStream:
+    """
+    流式 multipart/form-data 请求体
+
+    按需从磁盘读取文件内容, 内存占用与文件大小无关; 提供 __len__ 以便 requests 设置 Content-Length
+    """
+
+    def __init__(self, filePath: str, fields: Dict[str, str], fileField: str = "file",
+                 progress: Optional[Callable[[int, int], None]] = None) -> None:
+        self.boundary = uuid.uuid4().hex
+        filename = os.path.basename(filePath)
+        head = b"".join(
+            f'--{self.boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+            for name, value in fields.items()
+        )
+        head += (f'--{self.boundary}\r\nContent-Disposition: form-data; name="{fileField}"; filename="{filename}"\r\n'
+                 f'Content-Type: application/octet-stream\r\n\r\n').encode()
+        self._head = head
+        self._tail = f"\r\n--{self.boundary}--\r\n".encode()
+        self._file = open(filePath, "rb")
+        self._fileSize = os.path.getsize(filePath)
+        self._total = len(self._head) + self._fileSize + len(self._tail)
+        self._sent = 0
+        self._progress = progress
+
+
+    @property
+    def contentType(self) -> str:
+        return f"multipart/form-data; boundary={self.boundary}"
+
+
+    def __len__(self) -> int:
+        return self._total
+
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            size = self._total
+        data = b""
+        # 依次输出表单头、文件内容、结束边界
+        if self._sent < len(self._head):
+            data = self._head[self._sent:self._sent + size]
+        fileStart, fileEnd = len(self._head), len(self._head) + self._fileSize
+        if len(data) < size and self._sent + len(data) < fileEnd:
+            data += self._file.read(size - len(data))
+        if len(data) < size and self._sent + len(data) >= fileEnd:
+            offset = self._sent + len(data) - fileEnd
+            data += self._tail[offset:offset + size - len(data)]
+        self._sent += len(data)
+        if self._progress and data:
+            self._progress(min(max(self._sent - fileStart, 0), self._fileSize), self._fileSize)
+        return data
+
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class ArtifactCache:
+    """
+    本地 deb 缓存
+
+    以 URL 加服务器给出的校验信息(大小/修改时间或 ETag)作为键, 校验信息不变时直接复用本地文件;
+    无法连接服务器时回退到该 URL 最近一次缓存的文件. 超出容量时按 LRU 淘汰
+    """
+
+    MAX_SIZE_GB = 5.0
+
+
+    def __init__(self, root: Optional[Path] = None, maxSizeGB: Optional[float] = None) -> None:
+        self._root = Path(root) if root else cacheDir().joinpath("debs")
+        self._root.mkdir(parents=True, exist_ok=True)
+        self._indexFile = self._root.joinpath("index.json")
+        self._maxSize = int((maxSizeGB if maxSizeGB is not None else self.MAX_SIZE_GB) * 1024 ** 3)
+        self._lock = threading.Lock()
+
+
+    @staticmethod
+    def key(url: str, validator: Optional[str]) -> str:
+        return hashlib.sha256(f"{url}\n{validator}".encode()).hexdigest()
+
+
+    def _loadIndex(self) -> dict:
+        try:
+            with open(self._indexFile, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+
+    def _saveIndex(self, index: dict) -> None:
+        with open(f"{self._indexFile}.tmp", "w", encoding="utf-8") as f:
+            json.dump(index, f, indent=4)
+        os.replace(f"{self._indexFile}.tmp", self._indexFile)
+
+
+    def lookup(self, url: str, validator: Optional[str]) -> Optional[Path]:
+        """
+        查询缓存
+
+        Args:
+            url (str): 文件 URL
+            validator (Optional[str]): 服务器当前的校验信息, 为 None 表示无法连接服务器, 此时返回该 URL 最近一次的缓存;
+                为空字符串表示服务器可访问但没有给出校验信息, 此时无法判断缓存是否有效, 总是返回 None
+
+        Returns:
+            Optional[Path]: 命中时返回本地文件路径
+        """
+        if validator == "":
+            return None
+        with self._lock:
+            index = self._loadIndex()
+            if validator is None:
+                candidates = [k for k, entry in index.items() if entry["url"] == url]
+                key = max(candidates, key=lambda k: index[k]["atime"]) if candidates else None
+            else:
+                key = self.key(url, validator)
+            entry = index.get(key) if key else None
+            if entry is None:
+                return None
+            path = self._root.joinpath(key, entry["file"])
+            if not path.exists() or path.stat().st_size != entry["size"]:
+                index.pop(key)
+                self._saveIndex(index)
+                return None
+            entry["atime"] = time.time()
+            self._saveIndex(index)
+            return path
+
+
+    def reserve(self, url: str, validator: Optional[str], filename: str) -> Path:
+        """返回新缓存条目中文件的保存路径, 下载完成后调用 commit"""
+        path = self._root.joinpath(self.key(url, validator), filename)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return path
+
+
+    def commit(self, url: str, validator: Optional[str], path: Path, evict: bool = True) -> None:
+        """
+        登记下载完成的文件
+
+        Args:
+            url (str): 文件 URL
+            validator (Optional[str]): 校验信息
+            path (Path): reserve 返回的路径
+            evict (bool): 是否立即按 LRU 淘汰超出容量的条目; 批量安装时为 False, 安装结束后再调用 evict,
+                避免淘汰同一批中尚未安装的 deb
+        """
+        with self._lock:
+            index = self._loadIndex()
+            index[self.key(url, validator)] = {
+                "url": url,
+                "validator": validator,
+                "file": path.name,
+                "size": path.stat().st_size,
+                "atime": time.time(),
+            }
+            if evict:
+                self._evict(index)
+            self._saveIndex(index)
+
+
+    def evict(self) -> None:
+        """按 LRU 淘汰超出容量的条目"""
+        with self._lock:
+            index = self._loadIndex()
+            self._evict(index)
+            self._saveIndex(index)
+
+
+    def _evict(self, index: dict) -> None:
+        total = sum(entry["size"] for entry in index.values())
+        for key in sorted(index, key=lambda k: index[k]["atime"]):
+            if total <= self._maxSize or len(index) == 1:
+                break
+            total -= index.pop(key)["size"]
+            shutil.rmtree(self._root.joinpath(key), ignore_errors=True)
+
+
 class Chfs:
     """
     CuteHttpFileServer/chfs 文件服务器 client
     """
+
+    SESSION_TTL = 12 * 60 * 60      # 本地缓存会话的最长有效期(秒)
+    INDEX_TTL = 5 * 60              # 远端目录索引的有效期(秒)
     
     def __init__(self, ip: str = "10.51.33.211", port: int = 10000, user: str = "admin", pwd: str = "admin") -> None:
         """
@@ -27,14 +369,54 @@ class Chfs:
         self._user = user
         self._pwd = pwd
         self._session = requests.Session()
-        # 自动登录
-        self.login(self._user, self._pwd)
+        # 连接池大小需要覆盖并发下载的连接数
+        adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=16)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        # 延迟登录: 第一次需要访问服务器时才登录, 并优先复用本地缓存的会话
+        self._authenticated = False
+        self._authLock = threading.Lock()
+        self._sessionCache = SessionCache(ip, port, user, self.SESSION_TTL)
+        self._index = DirIndex(ip, port, self.INDEX_TTL)
 
 
     def _getUrl(self, endpoint: str):
         return f"http://{self._ip}:{self._port}/chfs/{endpoint}"
 
 
+    def _loadSession(self) -> bool:
+        """加载本地缓存的会话 cookie, 已过期或不存在时返回 False"""
+        cookies = self._sessionCache.load()
+        if cookies is None:
+            return False
+        self._session.cookies.update(cookies)
+        return True
+
+
+    def _saveSession(self) -> None:
+        self._sessionCache.save([(cookie.name, cookie.value, cookie.expires) for cookie in self._session.cookies])
+
+
+    def _ensureLogin(self, force: bool=False) -> None:
+        with self._authLock:
+            if self._authenticated and not force:
+                return
+            if force or not self._loadSession():
+                self.login(self._user, self._pwd)
+            self._authenticated = True
+
+
+    def _request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """发送需要登录的请求, 会话失效(401)时重新登录并重试一次"""
+        self._ensureLogin()
+        resp = self._session.request(method, url, **kwargs)
+        if resp.status_code == 401:
+            resp.close()
+            self._ensureLogin(force=True)
+            resp = self._session.request(method, url, **kwargs)
+        return resp
+
+
     def login(self, user: str, pwd: str) -> bool:
         """
         账户登录
@@ -49,6 +431,8 @@ class Chfs:
         login_data = {"user":user, "pwd":pwd}
         resp = self._session.post(self._getUrl("session"), data=login_data)
         if not resp.ok: print(resp.reason)
+        if resp.ok and user == self._user:
+            self._saveSession()
         return resp.ok
 
 
@@ -60,25 +444,29 @@ class Chfs:
             bool: 登出结果
         """
         resp = self._session.delete(self._getUrl("session"))
+        self._authenticated = False
+        self._sessionCache.clear()
         return resp.ok
         
 
-    def downloadFile(self, fileUrl:str, savePath:Optional[str]=None) -> bool:
+    def downloadFile(self, fileUrl:str, savePath:Optional[str]=None, connections: int=4, chunkSize: int=8 * 1024 * 1024) -> bool:
         """
         下载文件
 
+        服务器支持 Range 时按块并发下载到预分配的 .part 文件, 已完成的块记录在 .part.json 中, 中断后重试会从断点继续;
+        服务器不支持 Range 时退化为单连接流式下载
+
         Args:
             fileUrl (str): 文件在服务器上的路径
             savePath (Optional[str], optional): 要保存的路径. Defaults to None.
+            connections (int, optional): 并发连接数. Defaults to 4.
+            chunkSize (int, optional): 每个 Range 请求的块大小(字节). Defaults to 8MB.
 
         Returns:
             bool: 下载文件结果
         """
-        resp = self._session.get(self._getUrl(f"shared/{fileUrl}"), stream=True)
+        url = self._getUrl(f"shared/{fileUrl}")
 
-        # 检查请求是否成功
-        resp.raise_for_status()
-        
         # 如果未提供保存路径，从URL中提取文件名
         if savePath is None:
             # 从URL中提取文件名，处理URL编码
@@ -86,7 +474,37 @@ class Chfs:
             savePath = os.path.join(os.getcwd(), filename)
         
         # 确保保存目录存在
-        os.makedirs(os.path.dirname(savePath), exist_ok=True)
+        os.makedirs(os.path.dirname(savePath) or ".", exist_ok=True)
+
+        # 请求第一个字节, 探测服务器是否支持 Range 以及文件大小
+        resp = self._request("GET", url, headers={"Range": "bytes=0-0"}, stream=True)
+        contentRange = resp.headers.get("content-range", "")
+        if resp.status_code == 416 and contentRange.endswith("/0"):
+            # 空文件没有可以请求的字节范围
+            resp.close()
+            open(savePath, "wb").close()
+            print(f"下载完成(空文件): {fileUrl}")
+            return True
+        resp.raise_for_status()
+        if resp.status_code != 206 or "/" not in contentRange or contentRange.endswith("/*"):
+            resp.close()
+            return self._downloadStream(url, fileUrl, savePath)
+        resp.close()
+        fileSize = int(contentRange.rsplit("/", 1)[1])
+        validator = resp.headers.get("etag") or resp.headers.get("last-modified")
+
+        print(f"开始下载: {fileUrl}")
+        print(f"保存路径: {savePath}")
+        print(f"文件大小: {fileSize / (1024 * 1024):.2f} MB")
+        return self._downloadRanges(url, savePath, fileSize, max(1, connections), max(1, chunkSize), validator)
+
+
+    def _downloadStream(self, url: str, fileUrl: str, savePath: str) -> bool:
+        """单连接流式下载, 用于不支持 Range 的服务器"""
+        resp = self._request("GET", url, stream=True)
+
+        # 检查请求是否成功
+        resp.raise_for_status()
         
         # 获取文件大小（如果有）
         fileSize = int(resp.headers.get('content-length', 0))
@@ -118,6 +536,106 @@ class Chfs:
         return True
 
 
+    def _downloadRanges(self, url: str, savePath: str, fileSize: int, connections: int, chunkSize: int,
+                        validator: Optional[str]=None) -> bool:
+        """
+        多连接 Range 并发下载, 支持断点续传
+
+        断点记录中保存服务器给出的 ETag 或 Last-Modified(validator), 与当前不一致或没有时从头下载;
+        各分块请求带上 If-Range, 下载过程中远端文件变化时服务器返回完整内容, 此时丢弃断点并返回失败
+        """
+        partPath, statePath = f"{savePath}.part", f"{savePath}.part.json"
+        chunks = [(start, min(start + chunkSize, fileSize) - 1) for start in range(0, fileSize, chunkSize)]
+
+        # 读取断点记录, 文件或分块方式变化时重新下载
+        done = set()
+        try:
+            with open(statePath, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            if state.get("url") == url and state.get("size") == fileSize and state.get("chunkSize") == chunkSize \
+                    and validator and state.get("validator") == validator and os.path.exists(partPath):
+                done = set(state.get("done", []))
+        except (OSError, ValueError):
+            pass
+        if done:
+            print(f"断点续传: 已完成 {len(done)}/{len(chunks)} 块")
+
+        # 预分配稀疏文件, 各块按偏移量直接写入
+        with open(partPath, "r+b" if done else "wb") as f:
+            f.truncate(fileSize)
+
+        lock = threading.Lock()
+        progress = {"downloaded": sum(chunks[i][1] - chunks[i][0] + 1 for i in done), "step": -1}
+
+        def saveState():
+            tmpPath = f"{statePath}.tmp"
+            with open(tmpPath, "w", encoding="utf-8") as f:
+                json.dump({"url": url, "size": fileSize, "chunkSize": chunkSize, "validator": validator,
+                           "done": sorted(done)}, f)
+            os.replace(tmpPath, statePath)
+
+        def fetch(index: int):
+            start, end = chunks[index]
+            for attempt in range(3):
+                try:
+                    headers = {"Range": f"bytes={start}-{end}"}
+                    if validator:
+                        headers["If-Range"] = validator
+                    resp = self._request("GET", url, headers=headers, stream=True, timeout=60)
+                    resp.raise_for_status()
+                    if resp.status_code != 206:
+                        resp.close()
+                        if validator:
+                            raise RemoteChangedError(f"远端文件已变化: {url}")
+                        raise IOError(f"服务器未返回分块内容: {resp.status_code}")
+                    offset = start
+                    fd = os.open(partPath, os.O_WRONLY)
+                    try:
+                        for data in resp.iter_content(chunk_size=64 * 1024):
+                            os.pwrite(fd, data, offset)
+                            offset += len(data)
+                    finally:
+                        os.close(fd)
+                    if offset != end + 1:
+                        raise IOError(f"分块数据不完整: {start}-{end}")
+                    break
+                except (requests.exceptions.RequestException, IOError) as e:
+                    if attempt == 2 or isinstance(e, RemoteChangedError):
+                        raise
+                    print(f"\n分块 {start}-{end} 下载失败, 重试: {e}")
+                    time.sleep(2 ** attempt)
+            with lock:
+                done.add(index)
+                saveState()
+                progress["downloaded"] += end - start + 1
+                percent = progress["downloaded"] / fileSize * 100
+                if int(percent // 10) != progress["step"]:
+                    print(f"\r下载进度: {percent:.1f}%", end='')
+                    progress["step"] = int(percent // 10)
+
+        pending = [i for i in range(len(chunks)) if i not in done]
+        try:
+            with ThreadPoolExecutor(max_workers=connections) as executor:
+                for future in [executor.submit(fetch, i) for i in pending]:
+                    future.result()
+        except RemoteChangedError as e:
+            # 已下载的分块属于旧文件, 丢弃断点, 重新执行时从头下载
+            for path in (partPath, statePath):
+                if os.path.exists(path):
+                    os.remove(path)
+            print(f"\n{e}, 已丢弃断点, 请重新下载")
+            return False
+        except Exception as e:
+            print(f"\n下载中断, 已保存断点, 重新执行即可继续: {e}")
+            return False
+
+        os.replace(partPath, savePath)
+        if os.path.exists(statePath):
+            os.remove(statePath)
+        print("\n下载完成!")
+        return True
+
+
 
 
     def deleteFile(self, filePath:str) -> bool:
@@ -130,18 +648,124 @@ class Chfs:
         Returns:
             bool: 删除文件的结果
         """
-        resp = self._session.delete(self._getUrl(f"rmfiles?filepath={filePath}"))
+        resp = self._request("DELETE", self._getUrl(f"rmfiles?filepath={filePath}"))
         if not resp.ok: print(resp.reason)
+        self._index.invalidate(DirIndex.parentDir(filePath))
         return resp.ok
     
 
-    def downloadAndInstall(self, fileUrl: str, tmpDir: Optional[str] = None) -> bool:
-        """下载文件到临时目录并使用 apt 安装"""
+    def _remoteValidator(self, fileUrl: str, listings: Optional[Dict[str, Optional[List[dict]]]] = None) -> Optional[str]:
+        """
+        从目录列表中获取远端文件的大小与修改时间作为缓存校验信息, 无法连接时返回 None, 没有找到文件时返回空字符串
+
+        Args:
+            fileUrl (str): 文件在服务器上的路径
+            listings (Optional[Dict[str, Optional[List[dict]]]]): 调用方已经获取的目录列表(目录路径 -> 条目),
+                批量安装时同一目录只请求一次
+        """
+        parent = DirIndex.parentDir(fileUrl)
+        if listings is not None and parent in listings:
+            entries = listings[parent]
+        else:
+            try:
+                entries = self._listDir(parent)
+            except requests.exceptions.RequestException:
+                return None
+        for entry in entries or []:
+            if entry.get("name") == os.path.basename(fileUrl.rstrip("/")):
+                return f"{entry.get('size')}:{entry.get('mtime')}"
+        return ""
+
+
+    def _urlValidator(self, fileurl: str) -> Optional[str]:
+        """通过 HEAD 请求获取 ETag 或 Last-Modified/Content-Length 作为缓存校验信息, 无法连接时返回 None, 没有校验信息时返回空字符串"""
+        try:
+            resp = self._session.head(fileurl, allow_redirects=True, timeout=10)
+        except requests.exceptions.RequestException:
+            return None
+        if not resp.ok or not (resp.headers.get("etag") or resp.headers.get("last-modified")):
+            return ""
+        etag = resp.headers.get("etag")
+        if etag:
+            return f"etag:{etag}"
+        return f"{resp.headers.get('content-length')}:{resp.headers.get('last-modified')}"
+
+
+    def _fetchDeb(self, fileUrl: str, useCache: bool = True, tmpDir: Optional[str] = None,
+                  connections: int = 4, evict: bool = True,
+                  listings: Optional[Dict[str, Optional[List[dict]]]] = None) -> Optional[Path]:
+        """
+        下载服务器上的 deb, 使用缓存时优先复用本地缓存, 返回本地路径, 失败时返回 None
+
+        evict 见 ArtifactCache.commit, listings 见 _remoteValidator
+        """
+        def download(local_path: Path) -> bool:
+            # 网络错误及 HTTP 错误(如 404)只影响当前文件, 由调用方汇总
+            try:
+                return self.downloadFile(fileUrl=fileUrl, savePath=str(local_path), connections=connections)
+            except requests.exceptions.RequestException as e:
+                print(f"下载失败: {fileUrl}: {e}")
+                return False
+
+        if useCache:
+            cache = ArtifactCache()
+            url = self._getUrl(f"shared/{fileUrl}")
+            validator = self._remoteValidator(fileUrl, listings)
+            local_path = cache.lookup(url, validator)
+            if local_path is not None:
+                print(f"使用本地缓存: {local_path}")
+                return local_path
+            if validator is None:
+                print(f"无法获取远端文件信息且没有本地缓存: {fileUrl}")
+            local_path = cache.reserve(url, validator, os.path.basename(fileUrl))
+            if not download(local_path):
+                return None
+            if not self._verifyDeb(local_path):
+                shutil.rmtree(local_path.parent, ignore_errors=True)
+                return None
+            cache.commit(url, validator, local_path, evict=evict)
+            return local_path
+
         tmp_root = Path(tmpDir).expanduser() if tmpDir else Path("/tmp")
         tmp_root.mkdir(parents=True, exist_ok=True)
         local_path = tmp_root.joinpath(os.path.basename(fileUrl))
+        if not download(local_path):
+            return None
+        if not self._verifyDeb(local_path):
+            local_path.unlink()
+            return None
+        return local_path
+
+
+    @staticmethod
+    def _verifyDeb(path: Path) -> bool:
+        """
+        校验 deb 结构完整, 避免截断或损坏的文件进入缓存和 apt 事务
+
+        dpkg-deb --info 只读取控制信息, 截断的文件也能通过, 所以解压整个数据包(输出丢弃)
+        """
+        try:
+            (local["dpkg-deb"]["--fsys-tarfile", str(path)] > os.devnull)()
+        except ProcessExecutionError as e:
+            print(f"校验失败: {path.name}: {e.stderr.strip()}")
+            return False
+        return True
+
+
+    def downloadAndInstall(self, fileUrl: str, tmpDir: Optional[str] = None, useCache: bool = True) -> bool:
+        """
+        下载文件并使用 apt 安装
+
+        Args:
+            fileUrl (str): 文件在服务器上的路径
+            tmpDir (Optional[str]): 不使用缓存时的下载目录, 默认为 /tmp
+            useCache (bool): 是否使用本地 deb 缓存, 远端文件大小与修改时间不变时不再下载
 
-        if not self.downloadFile(fileUrl=fileUrl, savePath=str(local_path)):
+        Returns:
+            bool: 安装是否成功
+        """
+        local_path = self._fetchDeb(fileUrl, useCache=useCache, tmpDir=tmpDir)
+        if local_path is None:
             return False
 
         try:
@@ -151,15 +775,83 @@ class Chfs:
             return False
 
         return True
-    
 
 
-    def installFSDeb(self, fileurl: str) -> bool:
+    def installMany(self, *fileUrls: str, workers: int = 4, useCache: bool = True, tmpDir: Optional[str] = None) -> bool:
+        """
+        并发下载多个 deb 并在一次 apt 事务中安装
+
+        下载与校验并行进行, 全部成功后才执行安装, dpkg 触发器(ldconfig 等)只执行一次
+
+        Args:
+            fileUrls (str): 服务器上的 deb 路径, 或包含 deb 的目录(安装目录下所有 .deb)
+            workers (int): 并发下载数
+            useCache (bool): 是否使用本地 deb 缓存
+            tmpDir (Optional[str]): 不使用缓存时的下载目录
+
+        Returns:
+            bool: 安装是否成功
+        """
+        debs: List[str] = []
+        # 目录路径 -> 条目, 缓存校验信息从这里获取, 每个目录只请求一次
+        listings: Dict[str, Optional[List[dict]]] = {}
+        for fileUrl in fileUrls:
+            fileUrl = str(fileUrl)
+            if fileUrl.endswith(".deb"):
+                debs.append(fileUrl)
+                continue
+            entries = self._listDir(fileUrl)
+            if entries is None:
+                print(f"错误: 远端路径 {fileUrl} 不存在")
+                return False
+            listings[DirIndex.normDir(fileUrl)] = entries
+            debs += sorted(entry["path"].lstrip("/") for entry in entries if not entry["dir"] and entry["name"].endswith(".deb"))
+        if useCache:
+            for parent in sorted({DirIndex.parentDir(fileUrl) for fileUrl in debs} - set(listings)):
+                try:
+                    listings[parent] = self._listDir(parent)
+                except requests.exceptions.RequestException:
+                    pass            # 无法连接时由 _fetchDeb 回退到最近一次的缓存
+        if not debs:
+            print("没有需要安装的 deb")
+            return False
+
+        print(f"下载 {len(debs)} 个 deb...")
+        try:
+            # 安装结束前不淘汰缓存, 否则同一批中先下载的 deb 可能被后下载的挤出缓存
+            with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+                paths = list(executor.map(lambda fileUrl: self._fetchDeb(fileUrl, useCache=useCache, tmpDir=tmpDir,
+                                                                         connections=2, evict=False, listings=listings), debs))
+            failed = [fileUrl for fileUrl, path in zip(debs, paths) if path is None]
+            if failed:
+                print(f"以下文件下载或校验失败, 取消安装: {failed}")
+                return False
+
+            try:
+                sudo["apt", "install", "-y", *[str(path) for path in paths]] & FG
+            except Exception as exc:
+                print(f"安装失败: {exc}")
+                return False
+            print(f"安装成功: {len(paths)} 个 deb")
+            return True
+        finally:
+            if useCache:
+                ArtifactCache().evict()
+
+    # 命令行入口: chfs install-many
+    install_many = installMany
+
+
+
+    def installFSDeb(self, fileurl: str, useCache: bool = True) -> bool:
         """
-        使用 wget 下载文件到 tmp 目录，然后在 tmp 目录下执行 apt 安装
+        使用 wget 下载文件到本地缓存(或 tmp 目录)，然后执行 apt 安装
+
+        使用缓存时先通过 HEAD 请求校验远端文件, 未变化时直接安装缓存中的文件; 下载的文件经 dpkg-deb --info 校验后才会写入缓存
         
         Args:
             fileurl (str): 要下载的 deb 文件 URL
+            useCache (bool): 是否使用本地 deb 缓存
             
         Returns:
             bool: 安装是否成功
@@ -167,26 +859,47 @@ class Chfs:
         import tempfile
         import urllib.parse
         
-        # 创建临时目录
-        tmp_dir = local.path(tempfile.mkdtemp(prefix="chfs_install_"))
-        print(f"创建临时目录: {tmp_dir}")
-        
         # 从 URL 中提取文件名，正确处理 URL 编码
         parsed_url = urllib.parse.urlparse(fileurl)
         filename = urllib.parse.unquote(os.path.basename(parsed_url.path))
-        local_path = tmp_dir / filename
+
+        cache, validator, tmp_dir = None, None, None
+        if useCache:
+            cache = ArtifactCache()
+            validator = self._urlValidator(fileurl)
+            cached = cache.lookup(fileurl, validator)
+            if cached is not None:
+                print(f"使用本地缓存: {cached}")
+                try:
+                    sudo["apt", "install", "-y", str(cached)] & FG
+                    print("安装成功!")
+                    return True
+                except Exception as e:
+                    print(f"安装过程中发生错误: {e}")
+                    return False
+            local_path = local.path(str(cache.reserve(fileurl, validator, filename)))
+        else:
+            # 创建临时目录
+            tmp_dir = local.path(tempfile.mkdtemp(prefix="chfs_install_"))
+            print(f"创建临时目录: {tmp_dir}")
+            local_path = tmp_dir / filename
         
         try:
-            # 使用 wget 下载文件到临时目录，确保 URL 被正确引用
+            # 使用 wget 下载文件，确保 URL 被正确引用
             print(f"开始下载: {fileurl}")
             # 使用单引号包围 URL，防止 shell 解析特殊字符
             wget["-O", local_path, fileurl] & FG
             print(f"下载完成: {local_path}")
+            # 截断或损坏的文件不进入缓存和 apt 事务
+            if not self._verifyDeb(Path(str(local_path))):
+                if cache is not None:
+                    shutil.rmtree(Path(str(local_path)).parent, ignore_errors=True)
+                return False
+            if cache is not None:
+                cache.commit(fileurl, validator, Path(str(local_path)))
             
-            # 切换到 tmp 目录并执行 apt 安装
-            print(f"在 {tmp_dir} 目录下执行 apt 安装")
-            with local.cwd(tmp_dir):
-                sudo["apt", "install", "-y", filename] & FG
+            print(f"执行 apt 安装: {local_path}")
+            sudo["apt", "install", "-y", str(local_path)] & FG
             
             print("安装成功!")
             return True
@@ -196,23 +909,32 @@ class Chfs:
             return False
         finally:
             # 清理临时目录
-            try:
-                tmp_dir.delete()
-                print(f"已清理临时目录: {tmp_dir}")
-            except Exception as e:
-                print(f"清理临时目录失败: {e}")
+            if tmp_dir is not None:
+                try:
+                    tmp_dir.delete()
+                    print(f"已清理临时目录: {tmp_dir}")
+                except Exception as e:
+                    print(f"清理临时目录失败: {e}")
 
 
-    def uploadFile(self, filePath: str, destPath: str = "/", mkdir: bool=False) -> bool:
+    def uploadFile(self, filePath: str, destPath: str = "/", mkdir: bool=False, overwrite: bool=False, retries: int=3,
+                   progress: Optional[Callable[[int, int], None]]=None) -> bool:
         """
         上传文件到指定路径
+
+        请求体以流的方式从磁盘读取, 上传前通过 getListsOfDirs 检查远端同名文件: 大小一致时跳过上传,
+        大小不一致时需要 overwrite 才会先删除远端文件再上传(服务器拒绝覆盖同名文件)
         
         Args:
             filePath (str): 要上传的本地文件路径
             destPath (str): 目标目录路径，默认为根目录"/"
+            mkdir (bool): 目标目录不存在时是否创建
+            overwrite (bool): 远端存在大小不同的同名文件时是否覆盖
+            retries (int): 失败重试次数, 重试间隔指数退避
+            progress (Optional[Callable[[int, int], None]]): 进度回调, 参数为 (已发送字节数, 文件大小)
             
         Returns:
-            dict: 服务器响应的JSON数据，如果上传失败则返回None
+            bool: 上传结果(远端已存在相同文件时也返回 True)
         """
         try:
             # 检查文件是否存在
@@ -227,39 +949,47 @@ class Chfs:
             destPath = destPath.rstrip('/')
             if destPath == "":
                 destPath = "/"
-            
-            if mkdir:
-                _files, dirs = self.getListsOfDirs(destPath)
-                if _files is None and dirs is None:
-                    if Path(destPath).suffix == "":
-                        self.mkdir(destPath)
-                    else:
-                        self.mkdir(str(Path(destPath).parent.resolve()))
 
             # 获取文件大小
             fileSize = os.path.getsize(filePath)
+
+            entries, _dirs = self.getListsOfDirs(destPath, detail=True)
+            if entries is None and mkdir:
+                if Path(destPath).suffix == "":
+                    self.mkdir(destPath)
+                else:
+                    self.mkdir(str(Path(destPath).parent.resolve()))
+            for entry in entries or []:
+                if entry.get("name") != filename:
+                    continue
+                if entry.get("size") == fileSize:
+                    print(f"远端已存在相同大小的文件, 跳过上传: {destPath}/{filename}")
+                    return True
+                if not overwrite:
+                    print(f"错误: 远端已存在同名文件 {destPath}/{filename} (大小 {entry.get('size')}), 使用 --overwrite 覆盖")
+                    return False
+                self.deleteFile(f"{destPath.rstrip('/')}/{filename}")
+
             print(f"准备上传文件: {filename}")
             print(f"文件大小: {fileSize / (1024 * 1024):.2f} MB")
             print(f"目标路径: {destPath}")
-            
-            # 准备文件
-            with open(filePath, 'rb') as f:
 
-                files = {'file': (filename, f)}                
-                data = {'folder': destPath}
-                
-                uploadUrl = self._getUrl(f"upload")
-                print(f"上传中... {uploadUrl}")
-                resp = self._session.post(uploadUrl, files=files, data=data)
-            
-            # 检查响应状态
-            resp.raise_for_status()
+            if progress is None:
+                lastPrintedStep = [-1]
+
+                def progress(sent: int, total: int):
+                    percent = sent / total * 100 if total else 100.0
+                    if int(percent // 10) != lastPrintedStep[0]:
+                        print(f"\r上传进度: {percent:.1f}%", end='')
+                        lastPrintedStep[0] = int(percent // 10)
+
+            resp = self._postFile(filePath, destPath, retries=retries, progress=progress)
             if not resp.ok: print(resp.reason)
             return resp.ok
                 
         except requests.exceptions.RequestException as e:
             print(f"上传失败: {e}") # note 上传失败有可能是对应文件名称已经存在
-            if e.response:
+            if e.response is not None:
                 print(f"服务器响应: {e.response.text}")
             return False
         except Exception as e:
@@ -268,6 +998,191 @@ class Chfs:
 
 
 
+    def _postFile(self, filePath: str, destPath: str, retries: int=3,
+                  progress: Optional[Callable[[int, int], None]]=None, verbose: bool=True) -> requests.Response:
+        """以流的方式上传文件, 网络错误及 5xx 响应时指数退避重试"""
+        fileSize = os.path.getsize(filePath)
+        uploadUrl = self._getUrl(f"upload")
+        if verbose: print(f"上传中... {uploadUrl}")
+        for attempt in range(retries + 1):
+            stream = MultipartFileStream(filePath, {"folder": destPath}, progress=progress)
+            startTime = time.time()
+            try:
+                self._ensureLogin()
+                resp = self._session.post(uploadUrl, data=stream, headers={"Content-Type": stream.contentType})
+                if resp.status_code == 401 and attempt < retries:
+                    # 会话失效, 重新登录后用新的请求体重试
+                    self._ensureLogin(force=True)
+                    continue
+                resp.raise_for_status()
+                break
+            except requests.exceptions.RequestException as e:
+                # 4xx 为服务器明确拒绝(如同名文件), 重试没有意义
+                if attempt == retries or (e.response is not None and e.response.status_code < 500):
+                    raise
+                delay = 2 ** attempt
+                print(f"\n上传失败: {e}, {delay}s 后重试 ({attempt + 1}/{retries})")
+                time.sleep(delay)
+            finally:
+                stream.close()
+        self._index.invalidate(destPath)
+
+        elapsed = max(time.time() - startTime, 1e-6)
+        if verbose:
+            print(f"\n上传完成: {fileSize / (1024 * 1024):.2f} MB, 耗时 {elapsed:.1f}s, "
+                  f"平均速度 {fileSize / (1024 * 1024) / elapsed:.2f} MB/s")
+        return resp
+
+
+    def _syncFile(self) -> Path:
+        return cacheDir().joinpath(f"sync-{self._ip}-{self._port}.json")
+
+
+    @staticmethod
+    def _fileDigest(path: Path) -> str:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+
+    def sync(self, localDir: str, remoteDir: str, delete: bool=False, workers: int=4) -> bool:
+        """
+        将本地目录同步到服务器
+
+        对比本地目录与远端列表, 缺失的远端目录只创建一次, 仅上传新增或内容变化的文件;
+        所有上传在线程池中并发执行并共用同一个已登录的会话.
+
+        服务器不提供文件哈希, 每次同步后在本地记录已上传文件的大小、修改时间、sha256 以及远端的大小与修改时间
+        (sync-<ip>-<port>.json). 远端文件与记录一致且本地大小与修改时间未变化时跳过; 仅修改时间变化时比较 sha256;
+        没有记录(如其他机器上传)的同名文件重新上传
+
+        Args:
+            localDir (str): 本地目录, 如 gen_deb 输出的 dist/
+            remoteDir (str): 远端目录
+            delete (bool): 是否删除远端多余的文件及目录
+            workers (int): 并发上传数
+
+        Returns:
+            bool: 全部操作是否成功
+        """
+        localRoot = Path(localDir).expanduser().resolve()
+        if not localRoot.is_dir():
+            print(f"错误: 目录 {localRoot} 不存在")
+            return False
+        remoteRoot = "/" + remoteDir.strip("/")
+
+        def remotePath(rel: str) -> str:
+            return remoteRoot if rel in ("", ".") else f"{remoteRoot.rstrip('/')}/{rel}"
+
+        try:
+            with open(self._syncFile(), "r", encoding="utf-8") as f:
+                manifest: Dict[str, dict] = json.load(f)
+        except (OSError, ValueError):
+            manifest = {}
+
+        def unchanged(localFile: Path, stat: os.stat_result, remote: dict, record: Optional[dict]) -> bool:
+            if record is None or record["remote"] != [remote.get("size"), remote.get("mtime")] or record["size"] != stat.st_size:
+                return False
+            if record["mtime_ns"] == stat.st_mtime_ns:
+                return True
+            if self._fileDigest(localFile) != record["sha256"]:
+                return False
+            record["mtime_ns"] = stat.st_mtime_ns
+            return True
+
+        uploads: List[Tuple[Path, str, int]] = []
+        stale: List[str] = []
+        failed: List[str] = []
+        ok = True
+        for dirpath, dirnames, filenames in os.walk(localRoot):
+            dirnames.sort()
+            rel = Path(dirpath).relative_to(localRoot).as_posix()
+            target = remotePath(rel)
+            files, dirs = self.getListsOfDirs(target, detail=True)
+            if files is None:
+                # 父目录先于子目录遍历, 每个缺失目录只创建一次
+                ok = self.mkdir(target) and ok
+                files, dirs = [], []
+            remoteFiles = {item.get("name"): item for item in files}
+            for filename in sorted(filenames):
+                localFile = Path(dirpath, filename)
+                path = f"{target.rstrip('/')}/{filename}"
+                try:
+                    stat = localFile.stat()
+                    if filename in remoteFiles and unchanged(localFile, stat, remoteFiles[filename], manifest.get(path)):
+                        continue
+                except OSError as e:
+                    print(f"读取失败: {localFile}: {e}")
+                    failed.append(str(localFile))
+                    continue
+                if filename in remoteFiles:
+                    stale.append(path)
+                uploads.append((localFile, target, stat.st_size))
+            if delete:
+                names = set(filenames) | set(dirnames)
+                stale += [f"{target.rstrip('/')}/{item.get('name')}" for item in files + dirs if item.get("name") not in names]
+
+        # 内容变化的文件需要先删除远端旧文件, 服务器不允许覆盖同名文件
+        for path in stale:
+            print(f"删除远端文件: {path}")
+            manifest.pop(path, None)
+            ok = self.deleteFile(path) and ok
+
+        print(f"需要上传 {len(uploads)} 个文件")
+        totalSize = sum(size for _, _, size in uploads)
+        startTime = time.time()
+        lock = threading.Lock()
+        finished = [0]
+
+        def upload(item: Tuple[Path, str, int]) -> bool:
+            localFile, target, _ = item
+            try:
+                stat = localFile.stat()
+                resp = self._postFile(str(localFile), target, progress=lambda sent, total: None, verbose=False)
+                result = resp.ok
+                record = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": self._fileDigest(localFile)}
+            except (requests.exceptions.RequestException, OSError) as e:
+                # 单个文件失败(网络错误、本地文件被删除或不可读)不影响其他上传, 在汇总中报告
+                print(f"上传失败: {localFile}: {e}")
+                result = False
+            with lock:
+                finished[0] += 1
+                print(f"[{finished[0]}/{len(uploads)}] {'✔' if result else '✘'} {localFile.name} -> {target}")
+                if result:
+                    manifest[f"{target.rstrip('/')}/{localFile.name}"] = record
+                else:
+                    failed.append(str(localFile))
+            return result
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            results = list(executor.map(upload, uploads))
+        elapsed = max(time.time() - startTime, 1e-6)
+        print(f"同步完成: 上传 {len(uploads)} 个文件 {totalSize / (1024 * 1024):.2f} MB, 耗时 {elapsed:.1f}s, "
+              f"平均速度 {totalSize / (1024 * 1024) / elapsed:.2f} MB/s")
+        if failed:
+            print(f"以下 {len(failed)} 个文件同步失败:")
+            for path in failed:
+                print(f"    {path}")
+
+        # 记录远端文件上传后的大小与修改时间, 下次同步时用于判断远端文件是否被其他人修改
+        for target in sorted({target for _, target, _ in uploads}):
+            for entry in self._listDir(target) or []:
+                record = manifest.get(entry["path"])
+                if record is not None and "remote" not in record:
+                    record["remote"] = [entry.get("size"), entry.get("mtime")]
+        manifest = {path: record for path, record in manifest.items() if "remote" in record}
+        try:
+            self._syncFile().parent.mkdir(parents=True, exist_ok=True)
+            with open(f"{self._syncFile()}.tmp", "w", encoding="utf-8") as f:
+                json.dump(manifest, f)
+            os.replace(f"{self._syncFile()}.tmp", self._syncFile())
+        except OSError as e:
+            print(f"保存同步记录失败: {e}")
+        return ok and all(results) and not failed
+
+
     def mkdir(self, dirPath: str) -> bool:
         """
         创建文件夹
@@ -278,40 +1193,459 @@ class Chfs:
         Returns:
             bool: 创建文件夹结果
         """
-        resp = self._session.post(self._getUrl("newdir"), data={"filepath":dirPath})
+        resp = self._request("POST", self._getUrl("newdir"), data={"filepath":dirPath})
         if not resp.ok: print(resp.reason)
+        self._index.invalidate(DirIndex.parentDir(dirPath), dirPath)
         return resp.ok
 
 
-    def getListsOfDirs(self, path:str) -> Tuple[Optional[List[Any]], Optional[List[Any]]]:
+    def getListsOfDirs(self, path:str, detail: bool=False) -> Tuple[Optional[List[Any]], Optional[List[Any]]]:
         """
         获取文件夹下内容列表
 
         Args:
             path (str): 指定的文件夹路径
+            detail (bool): 为 True 时返回服务器给出的完整条目(包含 size 等字段)而不是名称, 不输出列表(上传前检查等内部调用)
 
         Returns:
             Tuple[Optional[List[Any]], Optional[List[Any]]]: 指定的文件夹路径下的文件列表, 指定的文件夹路径下的文件夹列表
         """
-        resp = self._session.get(self._getUrl(f"files?filepath={path}"))
-        if resp.ok:
-            jsonData:dict = resp.json()
+        items = self._listDir(path)
+        if items is not None:
             files:List[Any] = [] 
             dirs:List[Any] = []
-            for item in jsonData.get("files", []):
+            for item in items:
                 item:dict
                 if item.get("dir", False):
-                    dirs.append(item.get("name"))
+                    dirs.append(item if detail else item.get("name"))
                 else:
-                    files.append(item.get("name"))
-            print(f"files:{files},dirs:{dirs}")
+                    files.append(item if detail else item.get("name"))
+            if not detail:
+                print(f"files:{files},dirs:{dirs}")
             return files, dirs
         return None, None   # 代表没有这个文件或目录
+
+
+    def _listDir(self, path: str, useIndex: bool=False) -> Optional[List[dict]]:
+        """
+        获取目录下的原始条目, 并写入目录索引
+
+        Args:
+            path (str): 目录路径
+            useIndex (bool): 为 True 时优先使用未过期的索引, 否则总是请求服务器
+
+        Returns:
+            Optional[List[dict]]: 条目列表, 目录不存在时返回 None
+        """
+        path = DirIndex.normDir(path)
+        if useIndex:
+            cached = self._index.get(path)
+            if cached is not None:
+                return cached
+        resp = self._request("GET", self._getUrl(f"files?filepath={path}"))
+        if not resp.ok:
+            return None
+        entries = DirIndex.normalize(path, resp.json().get("files", []))
+        self._index.put(path, entries)
+        return entries
+
+
+    def walk(self, path: str="/", workers: int=8, refresh: bool=False) -> List[dict]:
+        """
+        递归获取远端目录树
+
+        同一层的目录并发请求(最多 workers 个), 结果写入带 TTL 的内存及磁盘索引
+
+        Args:
+            path (str): 起始目录
+            workers (int): 最大并发请求数
+            refresh (bool): 为 True 时忽略索引, 全部重新请求
+
+        Returns:
+            List[dict]: 所有条目, 包含 path、name、size、mtime、dir 字段
+        """
+        result: List[dict] = []
+        level = [DirIndex.normDir(path)]
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            while level:
+                listings = executor.map(lambda d: self._listDir(d, useIndex=not refresh), level)
+                level = []
+                for entries in listings:
+                    for entry in entries or []:
+                        result.append(entry)
+                        if entry["dir"]:
+                            level.append(entry["path"])
+        self._index.save()
+        return result
+
+
+    def find(self, pattern: str, path: str="/", latest: bool=False, refresh: bool=False) -> Any:
+        """
+        在远端目录树中按通配符查找文件, 优先使用目录索引
+
+        Args:
+            pattern (str): 通配符, 匹配完整路径或文件名, 如 "*/master/*.deb"
+            path (str): 起始目录
+            latest (bool): 为 True 时只返回修改时间最新的一个
+            refresh (bool): 为 True 时忽略索引重新获取
+
+        Returns:
+            Any: 按修改时间升序的匹配条目列表; latest 时返回最新条目的路径, 没有匹配时返回 None
+        """
+        matches = [
+            entry for entry in self.walk(path, refresh=refresh)
+            if not entry["dir"] and (fnmatch.fnmatch(entry["path"], pattern) or fnmatch.fnmatch(entry["name"], pattern))
+        ]
+        # mtime 可能是时间戳或格式化的时间字符串
+        matches.sort(key=lambda entry: (0, entry["mtime"], "") if isinstance(entry.get("mtime"), (int, float))
+                     else (1, 0, str(entry.get("mtime") or "")))
+        if latest:
+            return matches[-1]["path"] if matches else None
+        return matches
     
 
     
 
 
+class AsyncChfs:
+    """
+    CuteHttpFileServer/chfs 文件服务器 asyncio client
+
+    与 Chfs 提供相同的操作, 所有请求共用一个连接池; 并发的操作数超过 limit 时在客户端排队等待(背压),
+    适合在一个进程内同时驱动大量上传、下载、列表操作. 依赖 aiohttp, 仅在使用时导入
+
+    Example:
+        async with AsyncChfs() as client:
+            await asyncio.gather(*[client.uploadFile(deb, "/release") for deb in debs])
+    """
+
+    def __init__(self, ip: str = "10.51.33.211", port: int = 10000, user: str = "admin", pwd: str = "admin",
+                 limit: int = 64, limitPerHost: int = 32, timeout: float = 600, keepalive: float = 30) -> None:
+        """
+        Args:
+            ip (str): chfs 服务器 IP
+            port (int): chfs 服务器 Port
+            user (str): 默认用户名
+            pwd (str): 默认密码
+            limit (int): 同时进行的请求数上限, 同时也是连接池大小
+            limitPerHost (int): 单个服务器的连接数上限
+            timeout (float): 单个请求的总超时(秒)
+            keepalive (float): 空闲连接保持时间(秒)
+        """
+        self._ip, self._port = ip, port
+        self._user = user
+        self._pwd = pwd
+        self._limit, self._limitPerHost = limit, limitPerHost
+        self._timeout, self._keepalive = timeout, keepalive
+        self._session = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._authLock: Optional[asyncio.Lock] = None
+        self._authenticated = False
+        self._sessionCache = SessionCache(ip, port, user, Chfs.SESSION_TTL)
+        self._index = DirIndex(ip, port, Chfs.INDEX_TTL)
+
+
+    async def __aenter__(self) -> "AsyncChfs":
+        return self
+
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+
+    def _getUrl(self, endpoint: str):
+        return f"http://{self._ip}:{self._port}/chfs/{endpoint}"
+
+
+    async def _getSession(self):
+        if self._session is None:
+            import aiohttp
+            connector = aiohttp.TCPConnector(limit=self._limit, limit_per_host=self._limitPerHost,
+                                             keepalive_timeout=self._keepalive)
+            # 服务器通过 IP 访问, 需要允许非域名 cookie
+            self._session = aiohttp.ClientSession(connector=connector, cookie_jar=aiohttp.CookieJar(unsafe=True),
+                                                  timeout=aiohttp.ClientTimeout(total=self._timeout))
+            self._semaphore = asyncio.Semaphore(self._limit)
+            self._authLock = asyncio.Lock()
+        return self._session
+
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+    def _loadSession(self, session) -> bool:
+        cookies = self._sessionCache.load()
+        if cookies is None:
+            return False
+        from yarl import URL
+        session.cookie_jar.update_cookies(cookies, URL(self._getUrl("")))
+        return True
+
+
+    @staticmethod
+    def _cookieExpires(morsel) -> Optional[float]:
+        """cookie 的过期时间戳, 会话 cookie 返回 None"""
+        if str(morsel["max-age"]).lstrip("-").isdigit():
+            return time.time() + int(morsel["max-age"])
+        if morsel["expires"]:
+            from email.utils import parsedate_to_datetime
+            try:
+                return parsedate_to_datetime(morsel["expires"]).timestamp()
+            except (TypeError, ValueError):
+                return None
+        return None
+
+
+    def _saveSession(self, session) -> None:
+        self._sessionCache.save([(cookie.key, cookie.value, self._cookieExpires(cookie)) for cookie in session.cookie_jar])
+
+
+    async def login(self, user: str, pwd: str) -> bool:
+        """
+        账户登录
+
+        Args:
+            user (str): 用户名
+            pwd (str): 密码
+
+        Returns:
+            bool: 登录结果
+        """
+        session = await self._getSession()
+        async with session.post(self._getUrl("session"), data={"user": user, "pwd": pwd}) as resp:
+            if not resp.ok: print(resp.reason)
+            if resp.ok and user == self._user:
+                self._saveSession(session)
+            return resp.ok
+
+
+    async def logout(self) -> bool:
+        """
+        账户登出
+
+        Returns:
+            bool: 登出结果
+        """
+        session = await self._getSession()
+        async with session.delete(self._getUrl("session")) as resp:
+            self._authenticated = False
+            self._sessionCache.clear()
+            return resp.ok
+
+
+    async def _ensureLogin(self, force: bool=False) -> None:
+        session = await self._getSession()
+        async with self._authLock:
+            if self._authenticated and not force:
+                return
+            if force or not self._loadSession(session):
+                await self.login(self._user, self._pwd)
+            self._authenticated = True
+
+
+    @asynccontextmanager
+    async def _request(self, method: str, url: str, reauth: bool=True, **kwargs):
+        """发送需要登录的请求, 占用一个并发名额直到响应被释放; 401 时重新登录并重试一次(reauth)"""
+        await self._ensureLogin()
+        async with self._semaphore:
+            resp = await self._session.request(method, url, **kwargs)
+            if resp.status == 401 and reauth:
+                resp.release()
+                await self._ensureLogin(force=True)
+                resp = await self._session.request(method, url, **kwargs)
+            try:
+                yield resp
+            finally:
+                resp.release()
+
+
+    async def getListsOfDirs(self, path: str, detail: bool=False) -> Tuple[Optional[List[Any]], Optional[List[Any]]]:
+        """
+        获取文件夹下内容列表
+
+        Args:
+            path (str): 指定的文件夹路径
+            detail (bool): 为 True 时返回服务器给出的完整条目而不是名称
+
+        Returns:
+            Tuple[Optional[List[Any]], Optional[List[Any]]]: 文件列表, 文件夹列表; 目录不存在时均为 None
+        """
+        path = DirIndex.normDir(path)
+        async with self._request("GET", self._getUrl(f"files?filepath={path}")) as resp:
+            if not resp.ok:
+                return None, None
+            jsonData: dict = await resp.json(content_type=None)
+        entries = DirIndex.normalize(path, jsonData.get("files", []))
+        self._index.put(path, entries)
+        files: List[Any] = []
+        dirs: List[Any] = []
+        for item in entries:
+            (dirs if item["dir"] else files).append(item if detail else item.get("name"))
+        return files, dirs
+
+
+    async def mkdir(self, dirPath: str) -> bool:
+        """
+        创建文件夹
+
+        Args:
+            dirPath (str): 文件夹路径
+
+        Returns:
+            bool: 创建文件夹结果
+        """
+        async with self._request("POST", self._getUrl("newdir"), data={"filepath": dirPath}) as resp:
+            if not resp.ok: print(resp.reason)
+        self._index.invalidate(DirIndex.parentDir(dirPath), dirPath)
+        return resp.ok
+
+
+    async def deleteFile(self, filePath: str) -> bool:
+        """
+        删除文件
+
+        Args:
+            filePath (str): 文件路径
+
+        Returns:
+            bool: 删除文件的结果
+        """
+        async with self._request("DELETE", self._getUrl(f"rmfiles?filepath={filePath}")) as resp:
+            if not resp.ok: print(resp.reason)
+        self._index.invalidate(DirIndex.parentDir(filePath))
+        return resp.ok
+
+
+    async def downloadFile(self, fileUrl: str, savePath: Optional[str]=None, chunkSize: int=1024 * 1024) -> bool:
+        """
+        下载文件, 先写入 .part 文件, 完成后再重命名
+
+        中断后保留 .part 文件, 再次下载时通过 Range 从断点继续; 断点记录(.part.json)中保存服务器给出的 ETag 或
+        Last-Modified 并作为 If-Range 发送, 远端文件已变化时服务器返回完整内容, 重新下载
+
+        Args:
+            fileUrl (str): 文件在服务器上的路径
+            savePath (Optional[str], optional): 要保存的路径, 默认为当前目录下的同名文件
+            chunkSize (int, optional): 每次读取的字节数
+
+        Returns:
+            bool: 下载文件结果
+        """
+        import aiohttp
+        if savePath is None:
+            savePath = os.path.join(os.getcwd(), os.path.basename(fileUrl.split('?')[0]))
+        os.makedirs(os.path.dirname(savePath) or ".", exist_ok=True)
+        partPath, statePath = f"{savePath}.part", f"{savePath}.part.json"
+        url = self._getUrl(f"shared/{fileUrl}")
+
+        # 读取断点记录, 没有校验信息时无法判断 .part 是否属于同一个文件, 重新下载
+        offset, headers = 0, {}
+        try:
+            with open(statePath, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            if state.get("url") == url and state.get("validator") and os.path.exists(partPath):
+                offset = os.path.getsize(partPath)
+                headers = {"Range": f"bytes={offset}-", "If-Range": state["validator"]}
+        except (OSError, ValueError):
+            pass
+
+        loop = asyncio.get_event_loop()
+        try:
+            async with self._request("GET", url, headers=headers) as resp:
+                if resp.status == 416 and headers:
+                    # 断点超出远端文件大小, 丢弃断点重新下载
+                    for path in (partPath, statePath):
+                        if os.path.exists(path):
+                            os.remove(path)
+                    return await self.downloadFile(fileUrl, savePath, chunkSize)
+                if not resp.ok:
+                    print(f"下载失败: {fileUrl}: {resp.status} {resp.reason}")
+                    return False
+                if resp.status == 206 and resp.headers.get("Content-Range", "").startswith(f"bytes {offset}-"):
+                    print(f"断点续传: {fileUrl} 从 {offset / (1024 * 1024):.2f} MB 继续")
+                    mode = "ab"
+                else:
+                    mode = "wb"
+                    validator = resp.headers.get("ETag") or resp.headers.get("Last-Modified")
+                    with open(statePath, "w", encoding="utf-8") as f:
+                        json.dump({"url": url, "validator": validator}, f)
+                with open(partPath, mode) as f:
+                    async for data in resp.content.iter_chunked(chunkSize):
+                        # 磁盘写入放到线程池, 不阻塞事件循环
+                        await loop.run_in_executor(None, f.write, data)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print(f"下载中断, 已保存断点, 重新执行即可继续: {fileUrl}: {e!r}")
+            return False
+        os.replace(partPath, savePath)
+        if os.path.exists(statePath):
+            os.remove(statePath)
+        return True
+
+
+    async def uploadFile(self, filePath: str, destPath: str="/", mkdir: bool=False, overwrite: bool=False,
+                         progress: Optional[Callable[[int, int], None]]=None) -> bool:
+        """
+        上传文件到指定路径, 远端已存在相同大小的同名文件时跳过
+
+        Args:
+            filePath (str): 要上传的本地文件路径
+            destPath (str): 目标目录路径
+            mkdir (bool): 目标目录不存在时是否创建
+            overwrite (bool): 远端存在大小不同的同名文件时是否覆盖
+            progress (Optional[Callable[[int, int], None]]): 进度回调, 参数为 (已发送字节数, 文件大小)
+
+        Returns:
+            bool: 上传结果
+        """
+        if not os.path.exists(filePath):
+            print(f"错误: 文件 {filePath} 不存在")
+            return False
+        filename, fileSize = os.path.basename(filePath), os.path.getsize(filePath)
+        destPath = destPath.rstrip("/") or "/"
+
+        files, _dirs = await self.getListsOfDirs(destPath, detail=True)
+        if files is None and mkdir:
+            await self.mkdir(destPath)
+        for entry in files or []:
+            if entry.get("name") != filename:
+                continue
+            if entry.get("size") == fileSize:
+                return True
+            if not overwrite:
+                print(f"错误: 远端已存在同名文件 {destPath}/{filename}, 使用 overwrite 覆盖")
+                return False
+            await self.deleteFile(f"{destPath.rstrip('/')}/{filename}")
+
+        loop = asyncio.get_event_loop()
+        for attempt in range(2):
+            stream = MultipartFileStream(filePath, {"folder": destPath}, progress=progress)
+
+            async def body():
+                while True:
+                    data = await loop.run_in_executor(None, stream.read, 256 * 1024)
+                    if not data:
+                        break
+                    yield data
+
+            headers = {"Content-Type": stream.contentType, "Content-Length": str(len(stream))}
+            try:
+                # 请求体只能发送一次, 会话失效时用新的请求体重试
+                async with self._request("POST", self._getUrl("upload"), reauth=False, data=body(), headers=headers) as resp:
+                    if resp.status == 401 and attempt == 0:
+                        await self._ensureLogin(force=True)
+                        continue
+                    if not resp.ok:
+                        print(f"上传失败: {filePath}: {resp.status} {await resp.text()}")
+                self._index.invalidate(destPath)
+                return resp.ok
+            finally:
+                stream.close()
+        return False
+
+
 def main():
     fire.Fire(Chfs())
 
@@ -1,33 +1,97 @@
 #!/usr/bin/env python3
 import select
-from typing import List, Optional
-from plumbum import CommandNotFound, ProcessExecutionError, local , FG
-from plumbum.cmd import sudo, chmod, echo, cat, git, sed
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from pathlib import Path
-import fire
-from loguru import logger
-from dataclasses import asdict, dataclass, field
-from dataclasses_json import dataclass_json
+from dataclasses import asdict, dataclass, field, fields
+from contextlib import contextmanager
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import threading
+import hashlib
+import shutil
+import time
 import json
 import os
+import re
 
 VERSION = "0.1.0"
 
+
+class _Lazy:
+    """
+    首次使用时才创建的对象
+
+    gen_deb 经常被短生命周期的钩子调用, plumbum/loguru 等模块的导入与外部命令的查找推迟到真正需要时,
+    --help 等不需要它们的子命令启动更快, 也不要求已加载 ROS 环境
+    """
+
+    def __init__(self, factory: Callable[[], Any]) -> None:
+        self._factory = factory
+        self._obj = None
+
+    def _get(self) -> Any:
+        if self._obj is None:
+            self._obj = self._factory()
+        return self._obj
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._get(), name)
+
+    def __getitem__(self, args) -> Any:
+        return self._get()[args]
+
+    def __call__(self, *args, **kwargs) -> Any:
+        return self._get()(*args, **kwargs)
+
+    def __rand__(self, other) -> Any:
+        # 支持 cmd & FG
+        return other & self._get()
+
+
+def _command(name: str) -> _Lazy:
+    def factory():
+        from plumbum import local
+        return local[name]
+    return _Lazy(factory)
+
+
+def _loguru_logger():
+    from loguru import logger
+    return logger
+
+
+def _plumbum_fg():
+    from plumbum import FG
+    return FG
+
+
+logger            = _Lazy(_loguru_logger)
+FG                = _Lazy(_plumbum_fg)
+
 # ROS_VERSION = local["/usr/bin/rosversion"]["-d"]().strip()
 ROS_VERSION = os.environ.get("ROS_DISTRO", None)
-if ROS_VERSION is None:
-    logger.error("未检测到 ROS 版本,请确保已正确加载 ROS 环境变量")
-    exit(1)
 
 
-rospack           = local["/opt/ros/noetic/bin/rospack"]
-catkin_make       = local["/opt/ros/noetic/bin/catkin_make"]
-rosdep            = local["/usr/bin/rosdep"]
-bloom_generate    = local["bloom-generate"]
-fakeroot          = local["fakeroot"]
+def require_ros_version() -> str:
+    """构建相关的子命令需要 ROS 环境, 未加载时退出"""
+    if ROS_VERSION is None:
+        logger.error("未检测到 ROS 版本,请确保已正确加载 ROS 环境变量")
+        exit(1)
+    return ROS_VERSION
+
+
+sudo              = _command("sudo")
+echo              = _command("echo")
+cat               = _command("cat")
+git               = _command("git")
+rospack           = _command("/opt/ros/noetic/bin/rospack")
+catkin_make       = _command("/opt/ros/noetic/bin/catkin_make")
+rosdep            = _command("/usr/bin/rosdep")
+bloom_generate    = _command("bloom-generate")
+fakeroot          = _command("fakeroot")
 
 
 def is_git_repo(path: str) -> bool:
+    from plumbum import CommandNotFound, ProcessExecutionError, local
     try:
         with local.cwd(path):
             return git("rev-parse", "--is-inside-work-tree").strip() == "true"
@@ -35,12 +99,19 @@ def is_git_repo(path: str) -> bool:
         return False
 
 
-def get_branch_info():
-    branch_name = git("rev-parse", "--abbrev-ref", "HEAD").strip()
+def get_git_info(path: str = ".") -> Tuple[str, str, str]:
+    """获取分支名(去除 / 与 _)、提交数量与提交短 hash"""
+    _git = git.with_cwd(path)
+    branch_name = _git("rev-parse", "--abbrev-ref", "HEAD").strip()
     branch_name = branch_name.replace("/", "")
     branch_name = branch_name.replace("_", "")
-    commit_count = git("rev-list", "--count", "HEAD").strip()
-    commit_hash = git("log", "-1", "--format=%h").strip()
+    commit_count = _git("rev-list", "--count", "HEAD").strip()
+    commit_hash = _git("log", "-1", "--format=%h").strip()
+    return branch_name, commit_count, commit_hash
+
+
+def get_branch_info(path: str = "."):
+    branch_name, commit_count, commit_hash = get_git_info(path)
     return f"{branch_name}+{commit_count}-{commit_hash}"
 
 
@@ -63,23 +134,94 @@ def create_rosdep_source(pkgs_name, script_dir):
 
 
 
-@dataclass_json
+class DictMixin:
+    """dataclass 与 dict 互相转换, 嵌套的 dataclass 列表在 _NESTED 中声明"""
+
+    _NESTED: Dict[str, type] = {}
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        kwargs = {f.name: data[f.name] for f in fields(cls) if f.name in data}
+        for name, item_cls in cls._NESTED.items():
+            if name in kwargs:
+                kwargs[name] = [item_cls.from_dict(item) for item in kwargs[name]]
+        return cls(**kwargs)
+
+
 @dataclass
-class PackageInfo:
+class Span(DictMixin):
+    """构建阶段耗时"""
+    name: str                                   # 阶段名称
+    start: float                                # 开始时间戳(秒)
+    duration: float                             # 耗时(秒)
+    thread: str = "MainThread"                  # 执行线程
+
+
+@contextmanager
+def timed(spans: List[Span], name: str):
+    """记录代码块的耗时到 spans 中"""
+    start = time.time()
+    try:
+        yield
+    finally:
+        spans.append(Span(name=name, start=start, duration=time.time() - start, thread=threading.current_thread().name))
+        logger.debug(f"⏱  {name}: {spans[-1].duration:.2f}s")
+
+
+@dataclass
+class PackageInfo(DictMixin):
     """包信息"""
+    _NESTED = {"spans": Span}
+
     name: str                                   # 功能包名
     path: str                                   # 功能包路径
     version: str                                # 功能包版本
     abs_path: str                               # 功能包路径
     deb_name: Optional[str] = None              # 生成的deb包名称
+    depends: List[str] = field(default_factory=list)    # 工作空间内依赖的功能包
+    spans: List[Span] = field(default_factory=list)     # 各构建阶段耗时
+    build_jobs: Optional[int] = None            # 编译时使用的并行数
+    deb_size: Optional[int] = None              # deb 大小(字节)
+    dbgsym_name: Optional[str] = None           # 拆分出的调试符号包
+
+@dataclass(frozen=True)
+class BuildProfile:
+    """deb 打包配置"""
+    name: str
+    compression: str                            # dpkg-deb -Z 压缩算法
+    level: int                                  # dpkg-deb -z 压缩级别
+    strategy: Optional[str] = None              # dpkg-deb -S 压缩策略
+    skip: Tuple[str, ...] = ()                  # 跳过的 dh 步骤
+
+    def builddeb_args(self) -> List[str]:
+        args = [f"-Z{self.compression}", f"-z{self.level}"]
+        return args + [f"-S{self.strategy}"] if self.strategy else args
+
+
+BUILD_PROFILES = {
+    # 开发调试: 压缩与解压最快, 跳过文档、校验和与 lintian 等不影响运行的步骤
+    "dev": BuildProfile("dev", "gzip", 1, skip=(
+        "dh_installdocs", "dh_installchangelogs", "dh_installexamples", "dh_installman", "dh_compress",
+        "dh_md5sums", "dh_strip_nondeterminism", "dh_dwz", "dh_lintian",
+    )),
+    # 发布: 压缩率最高, 适合分发到机器人
+    "release": BuildProfile("release", "xz", 9, strategy="extreme"),
+}
+
 
-@dataclass_json
 @dataclass
-class PackgesInfo:
+class PackgesInfo(DictMixin):
+    _NESTED = {"packages": PackageInfo, "spans": Span}
+
     branch_name:str     = ""        # 分支命名
     commit_count:str    = ""        # 分支提交数量
     commit_hash:str     = ""        # 分支提交短hash
+    build_profile:str   = ""        # 打包配置
     packages: List[PackageInfo] = field(default_factory=list)
+    spans: List[Span] = field(default_factory=list)     # 工作空间级别阶段耗时
 
     def __str__(self) -> str:
         return f"{self.branch_name}+{self.commit_count}-{self.commit_hash}"
@@ -91,170 +233,1576 @@ class PackgesInfo:
             json.dump(asdict(self), f, indent=4, ensure_ascii=False)
 
 
-from catkin_pkg.topological_order import topological_order
+    @classmethod
+    def load(cls, file:str="/tmp/deb.json") -> Optional["PackgesInfo"]:
+        """读取上一次构建保存的JSON文件, 文件不存在时返回 None"""
+        if not Path(file).exists():
+            return None
+        with open(file, "r", encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+
+def get_changed_files(workspace_path, ref: str) -> List[Path]:
+    """获取工作空间相对 ref 的改动文件(包含未提交及未跟踪的文件)"""
+    _git = git.with_cwd(str(workspace_path))
+    changed = _git("diff", "--name-only", "--relative", ref).splitlines()
+    changed += _git("ls-files", "--others", "--exclude-standard").splitlines()
+    return [Path(workspace_path).joinpath(line.strip()) for line in changed if line.strip()]
+
+
+def get_affected_packages(packages: List[PackageInfo], changed_files: List[Path]) -> List[str]:
+    """
+    将改动文件映射到功能包, 并扩展到所有(传递的)反向依赖
+
+    Args:
+        packages (List[PackageInfo]): 按拓扑顺序排列的功能包
+        changed_files (List[Path]): 改动的文件
+
+    Returns:
+        List[str]: 需要重新构建的功能包名(拓扑顺序)
+    """
+    # 按路径深度倒序匹配, 嵌套的功能包优先归属到最内层
+    roots = sorted(packages, key=lambda pkg: len(Path(pkg.abs_path).parts), reverse=True)
+    affected = set()
+    for file in changed_files:
+        for pkg in roots:
+            if Path(pkg.abs_path) == file or Path(pkg.abs_path) in file.parents:
+                affected.add(pkg.name)
+                break
+
+    # depends 包含 exec_depend, catkin 的拓扑排序不考虑这类依赖, 所以不能依赖顺序一次遍历, 按反向依赖逐层扩展
+    dependents: Dict[str, List[str]] = {}
+    for pkg in packages:
+        for dep in pkg.depends:
+            dependents.setdefault(dep, []).append(pkg.name)
+    pending = list(affected)
+    while pending:
+        for name in dependents.get(pending.pop(), []):
+            if name not in affected:
+                affected.add(name)
+                pending.append(name)
+    return [pkg.name for pkg in packages if pkg.name in affected]
+
+
+def parse_deb_filename(path) -> Tuple[str, str, str]:
+    """解析 dpkg-deb 生成的文件名 <包名>_<版本(不含 epoch)>_<架构>.deb"""
+    package, version, arch = Path(path).name[:-len(".deb")].split("_")
+    return package, version, arch
+
+
+def deb_version(path) -> str:
+    """deb 的完整版本号(包含 epoch), 文件不存在时退化为文件名中的版本"""
+    if Path(path).is_file():
+        return _command("dpkg-deb")("-f", str(path), "Version").strip()
+    return parse_deb_filename(path)[1]
+
+
+def compare_versions(a: str, b: str) -> int:
+    """
+    按 dpkg 的规则比较版本号, 优先使用 python-apt, 未安装时调用 dpkg --compare-versions
+
+    Returns:
+        int: a < b 时为 -1, 相等为 0, a > b 时为 1
+    """
+    try:
+        import apt_pkg
+    except ImportError:
+        for op, result in (("lt", -1), ("eq", 0)):
+            if _command("dpkg").run(["--compare-versions", a, op, b], retcode=None)[0] == 0:
+                return result
+        return 1
+    apt_pkg.init_system()
+    result = apt_pkg.version_compare(a, b)
+    return (result > 0) - (result < 0)
+
+
+def read_dpkg_status(path: str="/var/lib/dpkg/status") -> Dict[Tuple[str, str], str]:
+    """
+    读取 dpkg status 文件中已完整安装的包
+
+    Returns:
+        Dict[Tuple[str, str], str]: (包名, 架构) -> 完整版本号(包含 epoch)
+    """
+    status = Deb822(Path(path).read_text(encoding="utf-8", errors="replace"))
+    installed = {}
+    for index in range(len(status.paragraphs)):
+        # Status 为 "<期望> <错误标记> <状态>", 期望为 hold 的包同样是已安装
+        words = (status.get("Status", index) or "").split()
+        if len(words) != 3 or words[2] != "installed":
+            continue
+        installed[(status.get("Package", index), status.get("Architecture", index))] = status.get("Version", index) or ""
+    return installed
+
+
+def plan_update(packages: List[PackageInfo], installed: Dict[Tuple[str, str], str]) -> List[PackageInfo]:
+    """
+    计算需要下载安装的最小功能包集合
+
+    版本号包含分支信息, 源码或依赖改动过的功能包(--since 会扩展到反向依赖)都会得到新版本, 因此只需比较版本
+
+    Args:
+        packages (List[PackageInfo]): 构建记录中按拓扑顺序排列的功能包
+        installed (Dict[Tuple[str, str], str]): 目标机器上已安装的包, 见 read_dpkg_status
+
+    Returns:
+        List[PackageInfo]: 需要更新的功能包(拓扑顺序)
+    """
+    plan = []
+    for pkg in packages:
+        if not pkg.deb_name:
+            continue
+        package, _, arch = parse_deb_filename(pkg.deb_name)
+        version = deb_version(pkg.deb_name)
+        current = installed.get((package, arch))
+        if current is not None:
+            order = compare_versions(current, version)
+            if order == 0:
+                continue
+            if order > 0:
+                # 切换分支后版本号可能变小, 仍然安装构建记录中的版本
+                logger.warning(f"⚠️  {package}: 已安装的 {current} 高于 {version}, 将降级")
+        logger.info(f"📥 {package}: {current or '未安装'} -> {version}")
+        plan.append(pkg)
+    return plan
+
+
+
+
+_DEPEND_TYPES = (
+    "build_depends", "buildtool_depends", "build_export_depends",
+    "buildtool_export_depends", "exec_depends", "run_depends", "test_depends",
+)
+
+
+def get_package_depends(pkg, names) -> List[str]:
+    """获取功能包在工作空间内的依赖(安装 deb 时同样需要运行依赖已就绪)"""
+    depends = set()
+    for depend_type in _DEPEND_TYPES:
+        for dep in getattr(pkg, depend_type, None) or []:
+            if getattr(dep, "evaluated_condition", None) is False:
+                continue
+            if dep.name in names and dep.name != pkg.name:
+                depends.add(dep.name)
+    return sorted(depends)
 
 
 def get_workspace_packages(workspace_path):
+    return WorkspaceIndex(workspace_path).packages()
+
+
+_SOURCE_IGNORES = {"debian", ".git", "__pycache__", ".obj-x86_64-linux-gnu", "obj-x86_64-linux-gnu"}
+
+
+def hash_file(path, digest=None):
+    digest = digest or hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest
+
+
+def hash_source_files(root: Path, files: List[str]) -> str:
+    """按给定顺序计算文件相对路径与内容(符号链接取指向)的哈希"""
+    digest = hashlib.sha256()
+    for relpath in files:
+        file = root.joinpath(relpath)
+        digest.update(relpath.encode())
+        if file.is_symlink():
+            digest.update(os.readlink(file).encode())
+        elif file.is_file():
+            hash_file(file, digest)
+    return digest.hexdigest()
+
+
+def hash_source_tree(path: str) -> str:
+    """计算功能包源码树的哈希(忽略 debian/ 与构建目录), 文件按相对路径排序保证结果稳定"""
+    root = Path(path)
+    files = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if d not in _SOURCE_IGNORES)
+        files += [str(Path(dirpath, filename).relative_to(root)) for filename in sorted(filenames)]
+    return hash_source_files(root, files)
+
+
+_DATA_SUFFIXES = {".msg", ".srv", ".action"}
+_IGNORE_MARKERS = {"AMENT_IGNORE", "CATKIN_IGNORE", "COLCON_IGNORE"}
+
+
+class WorkspaceIndex:
+    """
+    工作空间索引, 一次遍历得到所有功能包的文件清单、是否为数据包以及源码哈希
+
+    功能包的查找规则与 catkin_pkg 一致(跟随软链接, 跳过隐藏目录与 CATKIN_IGNORE 等标记), 功能包内的遍历规则与
+    hash_source_tree 一致. 结果按文件的大小与 mtime 失效并持久化, package.xml 均未改动时直接复用拓扑排序结果,
+    源码未改动时复用源码哈希, git 信息每个仓库只查询一次
+    """
+
+    DEFAULT_DIR = Path("~/.cache/gen_deb/workspaces").expanduser()
+
+
+    def __init__(self, workspace_path, index_dir: Optional[str]=None) -> None:
+        self._root = Path(workspace_path).expanduser().absolute()
+        index_dir = Path(index_dir).expanduser() if index_dir else self.DEFAULT_DIR
+        index_dir.mkdir(parents=True, exist_ok=True)
+        self._index_file = index_dir.joinpath(hashlib.sha256(str(self._root).encode()).hexdigest()[:16] + ".json")
+        self._lock = threading.Lock()
+        self._files: Dict[str, List[str]] = {}          # 功能包路径 -> 文件清单
+        self._git_roots: List[Path] = []                # 工作空间内的 git 仓库根目录
+        self._git_info: Dict[str, str] = {}
+        self._index = self._load_index()
+        self._scan()
+
+
+    def _load_index(self) -> dict:
+        try:
+            index = json.loads(self._index_file.read_text())
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+        return index if index.get("tool") == VERSION else {}
+
+
+    def _save_index(self) -> None:
+        tmp = self._index_file.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self._index, indent=4))
+        tmp.replace(self._index_file)
+
+
+    def _scan(self) -> None:
+        manifests, pkg_root = {}, None
+        for dirpath, dirnames, filenames in os.walk(self._root, followlinks=True):
+            current = Path(dirpath)
+            if pkg_root is not None and pkg_root not in current.parents:
+                pkg_root = None
+            if pkg_root is None:
+                if ".git" in dirnames or ".git" in filenames:
+                    self._git_roots.append(current)
+                if set(dirnames + filenames) & _IGNORE_MARKERS:
+                    del dirnames[:]
+                    continue
+                if "package.xml" not in filenames:
+                    dirnames[:] = sorted(d for d in dirnames if not d.startswith("."))
+                    continue
+                pkg_root = current
+                self._files[str(pkg_root)] = []
+            # 功能包内与 hash_source_tree 一样不进入软链接目录
+            dirnames[:] = sorted(d for d in dirnames if d not in _SOURCE_IGNORES and not current.joinpath(d).is_symlink())
+            for filename in sorted(filenames):
+                file = current.joinpath(filename)
+                try:
+                    stat = file.lstat()
+                except FileNotFoundError:
+                    continue
+                relpath = str(file.relative_to(pkg_root))
+                self._files[str(pkg_root)].append(relpath)
+                manifests.setdefault(str(pkg_root), []).append((relpath, stat.st_size, stat.st_mtime_ns))
+
+        entries = self._index.get("entries", {})
+        self._index["tool"] = VERSION
+        self._index["entries"] = {}
+        for path, files in self._files.items():
+            signature = hashlib.sha256(json.dumps(manifests.get(path, [])).encode()).hexdigest()
+            entry = entries.get(path)
+            if entry is None or entry["signature"] != signature:
+                entry = {
+                    "signature": signature,
+                    "files": len(files),
+                    "is_data": any(Path(f).suffix in _DATA_SUFFIXES for f in files),
+                    "source_hash": None,
+                }
+            self._index["entries"][path] = entry
+        self._save_index()
+
+
+    def packages(self) -> List[PackageInfo]:
+        """按拓扑顺序返回工作空间中的功能包, package.xml 与 ROS 版本均未改变时不重新解析"""
+        signature = hashlib.sha256(json.dumps([ROS_VERSION] + [
+            (path, os.stat(Path(path, "package.xml")).st_mtime_ns) for path in sorted(self._files)
+        ]).encode()).hexdigest()
+        if self._index.get("packages_signature") != signature:
+            from catkin_pkg.package import parse_package
+            from catkin_pkg.topological_order import topological_order_packages
+
+            parsed = {os.path.relpath(path, self._root): parse_package(path) for path in self._files}
+            ordered = topological_order_packages(parsed)
+            if ordered and ordered[-1][0] is None:
+                raise RuntimeError(f"功能包存在循环依赖: {ordered[-1][1]}")
+            names = {pkg.name for _, pkg in ordered}
+            if len(names) != len(ordered):
+                raise RuntimeError("工作空间中存在同名功能包")
+            self._index["packages"] = [PackageInfo(
+                name=pkg.name,
+                path=pkg_path,
+                abs_path=str(Path(pkg.filename).parent),
+                version=pkg.version,
+                depends=get_package_depends(pkg, names),
+            ).to_dict() for pkg_path, pkg in ordered]
+            self._index["packages_signature"] = signature
+            with self._lock:
+                self._save_index()
+        return [PackageInfo.from_dict(pkg) for pkg in self._index["packages"]]
+
+
+    def files(self, pkg: PackageInfo) -> List[str]:
+        """功能包的文件清单(相对路径, 与 hash_source_tree 的遍历顺序一致)"""
+        return self._files[pkg.abs_path]
+
+
+    def is_data_package(self, pkg: PackageInfo) -> bool:
+        """是否包含 msg/srv/action 定义"""
+        return self._index["entries"][pkg.abs_path]["is_data"]
+
+
+    def source_hash(self, pkg: PackageInfo) -> str:
+        """功能包的源码哈希, 文件未改动时直接读取索引"""
+        entry = self._index["entries"][pkg.abs_path]
+        if entry["source_hash"] is None:
+            source_hash = hash_source_files(Path(pkg.abs_path), self.files(pkg))
+            with self._lock:
+                entry["source_hash"] = source_hash
+                self._save_index()
+        return entry["source_hash"]
+
+
+    def branch_info(self, pkg: PackageInfo) -> str:
+        """功能包所在 git 仓库的分支信息, 同一仓库只查询一次"""
+        abs_path = Path(pkg.abs_path)
+        roots = [root for root in self._git_roots if root == abs_path or root in abs_path.parents]
+        if roots:
+            repo = max(roots, key=lambda root: len(root.parts))
+        elif os.path.commonpath([os.path.realpath(abs_path), os.path.realpath(self._root)]) == os.path.realpath(self._root):
+            repo = self._root
+        else:
+            repo = abs_path         # 通过软链接引入的外部功能包
+        with self._lock:
+            if str(repo) not in self._git_info:
+                self._git_info[str(repo)] = get_branch_info(str(repo))
+            return self._git_info[str(repo)]
+
+
+class BuildCache:
+    """
+    本地 deb 构建缓存, 以源码与构建参数的哈希作为键, 超出容量时按 LRU 淘汰
+
+    键中不包含 debian 版本增量(分支名 + 提交数 + 提交哈希), 否则每次提交都会使所有功能包失效.
+    命中时与 --changed_only 沿用上一次构建结果一样, 直接复用缓存中的 deb 及其原有版本号
+    """
+
+    DEFAULT_DIR = Path("~/.cache/gen_deb/debs").expanduser()
+
+
+    def __init__(self, cache_dir: Optional[str]=None, max_size_gb: float=10.0) -> None:
+        self._dir = Path(cache_dir).expanduser() if cache_dir else self.DEFAULT_DIR
+        self._dir.mkdir(parents=True, exist_ok=True)
+        self._index_file = self._dir.joinpath("index.json")
+        self._max_size = int(max_size_gb * 1024 ** 3)
+        self._lock = threading.Lock()
+        self.hits, self.misses = 0, 0
+
+
+    def key(self, pkg: PackageInfo, dep_debs: List[str], prefix: str, arch: str, stamped: bool,
+            source_hash: Optional[str]=None, profile: Optional[BuildProfile]=None, split_debug: bool=False) -> str:
+        """
+        生成缓存键
+
+        Args:
+            pkg (PackageInfo): 功能包信息
+            dep_debs (List[str]): 本次构建中依赖包生成的 deb 路径
+            prefix (str): deb 包名前缀
+            arch (str): 架构参数
+            stamped (bool): deb 版本号是否带 debian 版本增量(分支构建), 打 tag 构建不会复用分支构建的 deb
+            source_hash (Optional[str]): 源码哈希, 为空时遍历源码树计算
+            profile (Optional[BuildProfile]): 打包配置
+            split_debug (bool): 是否拆分调试符号
+
+        Returns:
+            str: 缓存键
+        """
+        digest = hashlib.sha256()
+        digest.update(json.dumps({
+            "tool": VERSION,
+            "ros_distro": ROS_VERSION,
+            "prefix": prefix,
+            "arch": arch,
+            "stamped": stamped,
+            "profile": asdict(profile) if profile else None,
+            "split_debug": split_debug,
+            "source": source_hash or hash_source_tree(pkg.abs_path),
+            "package_xml": hash_file(Path(pkg.abs_path).joinpath("package.xml")).hexdigest(),
+            "depends": sorted(hash_file(deb).hexdigest() for deb in dep_debs),
+        }, sort_keys=True).encode())
+        return digest.hexdigest()
+
+
+    def _load_index(self) -> dict:
+        try:
+            return json.loads(self._index_file.read_text())
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+
+    def _save_index(self, index: dict) -> None:
+        tmp = self._index_file.with_suffix(".tmp")
+        tmp.write_text(json.dumps(index, indent=4))
+        tmp.replace(self._index_file)
+
+
+    def get(self, key: str) -> Optional[dict]:
+        """查询缓存, 命中时返回条目并刷新访问时间"""
+        with self._lock:
+            index = self._load_index()
+            entry = index.get(key)
+            if entry is None or not self._dir.joinpath(key, entry["file"]).exists():
+                index.pop(key, None)
+                self.misses += 1
+                return None
+            entry["atime"] = time.time()
+            self._save_index(index)
+            self.hits += 1
+            entry = dict(entry, path=str(self._dir.joinpath(key, entry["file"])))
+            if entry.get("dbgsym"):
+                entry["dbgsym_path"] = str(self._dir.joinpath(key, entry["dbgsym"]))
+            return entry
+
+
+    def put(self, key: str, deb_path: str, package: str, dbgsym_path: Optional[str]=None) -> None:
+        """将构建出的 deb(以及拆分出的调试符号包)存入缓存"""
+        with self._lock:
+            entry_dir = self._dir.joinpath(key)
+            entry_dir.mkdir(parents=True, exist_ok=True)
+            files = [deb_path] + ([dbgsym_path] if dbgsym_path else [])
+            for file in files:
+                shutil.copy2(file, entry_dir.joinpath(Path(file).name))
+            index = self._load_index()
+            index[key] = {
+                "file": Path(deb_path).name,
+                "package": package,
+                "dbgsym": Path(dbgsym_path).name if dbgsym_path else None,
+                "size": sum(Path(file).stat().st_size for file in files),
+                "atime": time.time(),
+            }
+            self._evict(index)
+            self._save_index(index)
+
+
+    def _evict(self, index: dict) -> None:
+        total = sum(entry["size"] for entry in index.values())
+        for key in sorted(index, key=lambda k: index[k]["atime"]):
+            if total <= self._max_size:
+                break
+            total -= index.pop(key)["size"]
+            shutil.rmtree(self._dir.joinpath(key), ignore_errors=True)
+            logger.info(f"🧹 Evicted cached deb: {key}")
+
+
+def _read_int(path: str) -> Optional[int]:
+    try:
+        value = Path(path).read_text().split()[0]
+    except (OSError, IndexError):
+        return None
+    return int(value) if value.isdigit() else None
 
-    src_path = Path(workspace_path)
-    
-    # 按拓扑顺序排序
-    ordered = topological_order(str(src_path))
-    
-    package_infos = []
-    for pkg_path, pkg in ordered:
-
-        package_infos.append(PackageInfo(
-            name=pkg.name,
-            path=pkg_path,
-            abs_path=str(Path(pkg.filename).parent),
-            version=pkg.version,
-        ))
-    
-    return package_infos
+
+def detect_cpu_count() -> int:
+    """可用 CPU 数量, 同时考虑 CPU 亲和性与 cgroup 配额"""
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    quota, period = None, None
+    try:
+        # cgroup v2: "max 100000" 或 "200000 100000"
+        quota_text, period_text = Path("/sys/fs/cgroup/cpu.max").read_text().split()
+        if quota_text != "max":
+            quota, period = int(quota_text), int(period_text)
+    except (OSError, ValueError):
+        quota, period = _read_int("/sys/fs/cgroup/cpu/cpu.cfs_quota_us"), _read_int("/sys/fs/cgroup/cpu/cpu.cfs_period_us")
+    if quota and period and quota > 0:
+        cpus = min(cpus, max(1, quota // period))
+    return max(1, cpus)
+
+
+def detect_memory() -> int:
+    """可用内存(字节), 取 MemAvailable 与 cgroup 剩余额度中较小的一个"""
+    available = None
+    try:
+        for line in Path("/proc/meminfo").read_text().splitlines():
+            if line.startswith("MemAvailable:"):
+                available = int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    limit = _read_int("/sys/fs/cgroup/memory.max") or _read_int("/sys/fs/cgroup/memory/memory.limit_in_bytes")
+    usage = _read_int("/sys/fs/cgroup/memory.current") or _read_int("/sys/fs/cgroup/memory/memory.usage_in_bytes")
+    # cgroup v1 没有限制时 limit 是一个接近 2^63 的值
+    if limit and usage is not None and limit < (1 << 60):
+        available = min(available, limit - usage) if available else limit - usage
+    return max(0, available or 0)
+
+
+class ResourcePlanner:
+    """根据 CPU、内存以及同时编译的功能包数量, 为每次 debian/rules binary 分配并行数"""
+
+
+    def __init__(self, jobs: int=0, mem_per_job_gb: float=1.5) -> None:
+        """
+        Args:
+            jobs (int): 固定每个功能包的并行数, 0 表示自动计算
+            mem_per_job_gb (float): 每个编译进程预留的内存(GB), C++ 编译通常需要 1~2GB
+        """
+        self._fixed = jobs
+        self._mem_per_job = int(mem_per_job_gb * 1024 ** 3)
+        # 内存在开始构建前采样一次, 之后按并发数平分, 不受已在编译的包占用的影响
+        self._cpus = detect_cpu_count()
+        self._memory = detect_memory()
+        self._active = 0
+        self._scheduled = 1
+        self._lock = threading.Lock()
+
+
+    def schedule(self, count: int) -> None:
+        """调度器当前同时构建的功能包数, 同一批开始的包即使尚未进入编译也会计入, 避免先开始的包占满 CPU"""
+        with self._lock:
+            self._scheduled = max(1, count)
+
+
+    @contextmanager
+    def slot(self, name: str):
+        """占用一个编译槽位, 返回本次编译可使用的并行数, 按开始编译时的并发数平分 CPU 与内存"""
+        with self._lock:
+            self._active += 1
+            concurrency = max(self._active, self._scheduled)
+        try:
+            if self._fixed > 0:
+                jobs = self._fixed
+                logger.info(f"⚙️  {name}: parallel={jobs} (fixed)")
+            else:
+                cpus, memory = max(1, self._cpus // concurrency), self._memory // concurrency
+                mem_jobs = max(1, memory // self._mem_per_job) if self._mem_per_job > 0 else cpus
+                jobs = min(cpus, mem_jobs)
+                logger.info(f"⚙️  {name}: parallel={jobs} (cpus={cpus}, mem={memory / 1024 ** 3:.1f}G, "
+                            f"concurrent builds={concurrency})")
+            yield jobs
+        finally:
+            with self._lock:
+                self._active -= 1
+
+
+class CompilerCache:
+    """ccache 编译缓存, 在生成的 debian/rules 中启用, 并统计本次运行的命中情况"""
+
+
+    def __init__(self, cache_dir: Optional[str]=None) -> None:
+        self.dir = str(Path(cache_dir or os.environ.get("CCACHE_DIR") or "~/.ccache").expanduser())
+        self._start = self.stats()
+
+
+    @staticmethod
+    def available() -> bool:
+        return shutil.which("ccache") is not None and Path("/usr/lib/ccache").is_dir()
+
+
+    def stats(self) -> dict:
+        """读取 ccache 统计计数(ccache >= 3.7)"""
+        try:
+            from plumbum import CommandNotFound, ProcessExecutionError
+            output = _command("ccache").with_env(CCACHE_DIR=self.dir)("--print-stats")
+        except (ProcessExecutionError, CommandNotFound):
+            return {}
+        stats = {}
+        for line in output.splitlines():
+            key, _, value = line.partition("\t")
+            if value.strip().isdigit():
+                stats[key] = int(value)
+        return stats
+
+
+    def report(self) -> None:
+        end = self.stats()
+        delta = {key: end.get(key, 0) - self._start.get(key, 0) for key in end}
+        hits = delta.get("direct_cache_hit", 0) + delta.get("preprocessed_cache_hit", 0)
+        misses = delta.get("cache_miss", 0)
+        total = hits + misses
+        rate = f"{hits / total * 100:.1f}%" if total else "n/a"
+        logger.info(f"♻️  ccache: {hits} hit(s), {misses} miss(es), hit rate {rate} ({self.dir})")
+
+
+_APT_LOCK = threading.Lock()
+
+
+class LocalAptRepo:
+    """
+    dist/ 下的临时本地 apt 源
+
+    构建出的 deb 增量写入 Packages 索引, 构建依赖按需批量安装, 结束时一次性 purge 所有包
+    """
+
+    LIST_FILE = "/etc/apt/sources.list.d/gen_deb-local.list"
+
+
+    def __init__(self, dist_path: Path) -> None:
+        self._dist = Path(dist_path)
+        self._repo = self._dist.joinpath(".apt")
+        self._stanzas = {}          # 功能包名 -> Packages 条目
+        self._packages = {}         # 功能包名 -> (deb 包名, 版本)
+        self._installed = set()
+        self._dirty = False
+
+
+    def open(self) -> None:
+        self._repo.mkdir(parents=True, exist_ok=True)
+        self._write_index()
+        content = f"deb [trusted=yes] file:{self._dist} {self._repo.name}/"
+        (echo[content] | sudo["tee", self.LIST_FILE])()
+
+
+    def close(self) -> None:
+        sudo["rm", "-f", self.LIST_FILE]()
+        shutil.rmtree(self._repo, ignore_errors=True)
+
+
+    def add(self, name: str, deb_path: str) -> None:
+        """将 deb 加入索引, 只解析新加入的 deb"""
+        deb = Path(deb_path)
+        control = _command("dpkg-deb")("-f", str(deb)).rstrip("\n")
+        fields = dict(line.split(": ", 1) for line in control.splitlines() if ": " in line and not line.startswith(" "))
+        stanza = "\n".join([
+            control,
+            f"Filename: {deb.relative_to(self._dist)}",
+            f"Size: {deb.stat().st_size}",
+            f"SHA256: {hash_file(deb).hexdigest()}",
+        ])
+        with _APT_LOCK:
+            self._stanzas[name] = stanza
+            self._packages[name] = (fields["Package"], fields["Version"])
+            self._write_index()
+
+
+    def _write_index(self) -> None:
+        tmp = self._repo.joinpath("Packages.tmp")
+        tmp.write_text("".join(f"{stanza}\n\n" for stanza in self._stanzas.values()))
+        tmp.replace(self._repo.joinpath("Packages"))
+        self._dirty = True
+
+
+    def install(self, names: List[str]) -> None:
+        """在一次 apt 事务中安装尚未安装的功能包, 其工作空间内的依赖由 apt 从本地源解析"""
+        with _APT_LOCK:
+            missing = [name for name in names if name in self._packages and name not in self._installed]
+            if not missing:
+                return
+            if self._dirty:
+                # 只刷新本地源, 不触碰系统中的其他源
+                sudo["apt-get", "update", "-o", f"Dir::Etc::sourcelist={self.LIST_FILE}",
+                     "-o", "Dir::Etc::sourceparts=-", "-o", "APT::Get::List-Cleanup=0"]()
+                self._dirty = False
+            targets = [f"{package}={version}" for package, version in (self._packages[name] for name in missing)]
+            sudo["apt-get", "install", "-y", "--allow-downgrades", *targets] & FG
+            self._installed.update(missing)
+
+
+    def installed(self) -> List[str]:
+        """本地源中当前已安装的包(包括 apt 作为依赖安装的包)"""
+        packages = [package for package, _ in self._packages.values()]
+        if not packages:
+            return []
+        # 从未被 apt update 索引过的包 dpkg-query 同样不认识, 此时返回码为 1, 只看输出即可
+        _, out, _ = _command("dpkg-query").run(["-W", "-f=${Package} ${Status}\n", *packages], retcode=None)
+        return [line.split(" ", 1)[0] for line in out.splitlines() if line.endswith(" installed")]
+
+
+    def purge(self) -> None:
+        """
+        一次性卸载本地源中已安装的包
+
+        apt-get purge 遇到未索引的包名会直接失败, 所以只卸载 dpkg 中确实已安装的包; 卸载失败只记录警告, 不影响构建结果
+        """
+        from plumbum import ProcessExecutionError
+        with _APT_LOCK:
+            try:
+                packages = self.installed()
+                if packages:
+                    sudo["apt-get", "purge", "-y", *packages] & FG
+            except ProcessExecutionError as e:
+                logger.warning(f"⚠️  卸载构建依赖失败: {e}")
+            self._installed.clear()
+
+
+class BuildSysroot:
+    """
+    隔离构建使用的依赖目录, 代替通过本地 apt 源把依赖安装到系统中
+
+    每个已构建的 deb 在首次被依赖时用 dpkg-deb -x 解包到 dist/.sysroot/<功能包>(只解包一次), 构建时把依赖闭包中
+    各个目录的安装前缀通过环境变量叠加在基础 ROS 安装之上. 整个过程不经过 apt/dpkg, 多个功能包可以同时构建,
+    容器中的 /opt/ros 也不会被修改. 依赖的外部系统包需要已经安装在基础镜像中
+
+    限制: 打包前只能把文本文件中的解包目录路径还原为安装路径, 二进制中的路径(如链接依赖库时写入的 RPATH/RUNPATH)
+    无法改写. 这类功能包的 debian/rules 会在打包前检查并失败, 需要改用非隔离构建
+    """
+
+    def __init__(self, dist_path: Path, install_prefix: str) -> None:
+        self.root = Path(dist_path).joinpath(".sysroot")
+        self._prefix = install_prefix
+        self._debs = {}             # 功能包名 -> deb 路径
+        self._unpacked = {}         # 功能包名 -> 解包后的安装前缀
+        self._locks = {}
+        self._lock = threading.Lock()
+
+
+    def open(self) -> None:
+        shutil.rmtree(self.root, ignore_errors=True)
+        self.root.mkdir(parents=True)
+
+
+    def close(self) -> None:
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+    def add(self, name: str, deb_path: str) -> None:
+        with self._lock:
+            self._debs[name] = deb_path
+
+
+    def _unpack(self, name: str) -> Path:
+        with self._lock:
+            lock = self._locks.setdefault(name, threading.Lock())
+        with lock:
+            if name not in self._unpacked:
+                root = self.root.joinpath(name)
+                _command("dpkg-deb")("-x", self._debs[name], str(root))
+                prefix = root.joinpath(self._prefix.lstrip("/"))
+                self._relocate(prefix)
+                self._unpacked[name] = prefix
+        return self._unpacked[name]
+
+
+    def _relocate(self, prefix: Path) -> None:
+        """
+        catkin 生成的 CMake 配置与 pkg-config 文件中写死了安装前缀, 指向解包目录中实际存在的文件时改写为解包后的路径
+        """
+        pattern = re.compile(re.escape(self._prefix) + r"(/[^\s;\"':()]*)?")
+
+        def relocate(match):
+            relocated = str(prefix) + (match.group(1) or "")
+            return relocated if os.path.exists(relocated) else match.group(0)
+
+        for file in [*prefix.glob("share/*/cmake/*.cmake"), *prefix.glob("lib/pkgconfig/*.pc")]:
+            text = file.read_text()
+            relocated = pattern.sub(relocate, text)
+            if relocated != text:
+                file.write_text(relocated)
+
+
+    def env(self, names: List[str]) -> Dict[str, str]:
+        """
+        构建环境变量, 依赖目录排在系统原有路径之前
+
+        Args:
+            names (List[str]): 依赖闭包中的功能包
+
+        Returns:
+            Dict[str, str]: 传给 debian/rules 的环境变量
+        """
+        prefixes = [self._unpack(name) for name in names if name in self._debs]
+        paths = {
+            "CMAKE_PREFIX_PATH": prefixes,
+            "AMENT_PREFIX_PATH": prefixes,
+            "ROS_PACKAGE_PATH": [prefix.joinpath("share") for prefix in prefixes],
+            "PYTHONPATH": [path for prefix in prefixes for path in sorted(prefix.glob("lib/python3*/*-packages"))],
+            "LD_LIBRARY_PATH": [prefix.joinpath("lib") for prefix in prefixes],
+            "PKG_CONFIG_PATH": [prefix.joinpath("lib", "pkgconfig") for prefix in prefixes],
+            "PATH": [prefix.joinpath("bin") for prefix in prefixes],
+        }
+        env = {}
+        for var, values in paths.items():
+            values = [str(value) for value in values if value.exists()]
+            if values:
+                env[var] = ":".join(values + ([os.environ[var]] if os.environ.get(var) else []))
+        # 链接器通过 -rpath-link 查找依赖库自身依赖(NEEDED)的解包目录中的库, 不会写入产物;
+        # dh 通过 dpkg-buildflags 设置 LDFLAGS, 直接设置 LDFLAGS 会丢掉默认的加固参数, 所以使用 DEB_LDFLAGS_APPEND
+        if "LD_LIBRARY_PATH" in env:
+            libs = ":".join(str(prefix.joinpath("lib")) for prefix in prefixes if prefix.joinpath("lib").exists())
+            env["DEB_LDFLAGS_APPEND"] = " ".join(filter(None, [os.environ.get("DEB_LDFLAGS_APPEND"), f"-Wl,-rpath-link,{libs}"]))
+        return env
+
+
+class Deb822:
+    """
+    deb822 格式文件(debian/control), 保留字段顺序、续行与注释, 未修改的字段原样写回
+
+    与 sed 一样, 修改字段时作用于所有包含该字段的段落
+    """
+
+    def __init__(self, text: str) -> None:
+        self.paragraphs: List[List[List[Optional[str]]]] = []      # 段落 -> [字段名, 冒号后的原始内容]
+        paragraph = None
+        for line in text.splitlines():
+            if not line.strip():
+                paragraph = None
+                continue
+            if paragraph is None:
+                paragraph = []
+                self.paragraphs.append(paragraph)
+            if line.startswith("#"):
+                paragraph.append([None, line])
+            elif line[0] in " \t" and paragraph and paragraph[-1][0] is not None:
+                paragraph[-1][1] += "\n" + line
+            else:
+                key, _, value = line.partition(":")
+                paragraph.append([key, value])
+
+
+    def get(self, key: str, paragraph: int=0) -> Optional[str]:
+        for name, value in self.paragraphs[paragraph]:
+            if name == key:
+                return value.strip()
+        return None
+
+
+    def set(self, key: str, value: str) -> None:
+        for paragraph in self.paragraphs:
+            for item in paragraph:
+                if item[0] == key:
+                    item[1] = f" {value}"
+
+
+    def add_prefix(self, key: str, prefix: str) -> None:
+        for paragraph in self.paragraphs:
+            for item in paragraph:
+                if item[0] == key and item[1].startswith(" "):
+                    item[1] = f" {prefix}{item[1][1:]}"
+
+
+    def __str__(self) -> str:
+        return "\n\n".join(
+            "\n".join(value if key is None else f"{key}:{value}" for key, value in paragraph)
+            for paragraph in self.paragraphs
+        ) + "\n"
+
+
+class DebianEditor:
+    """
+    debian/ 目录的进程内编辑器
+
+    所有修改先在内存中进行, save() 时每个改动过的文件只写一次, 维护脚本与 rules 同时加上可执行权限
+    """
+
+    EXECUTABLES = {"rules", "preinst", "postinst", "prerm", "postrm"}
+
+
+    def __init__(self, path) -> None:
+        self._path = Path(path)
+        self._texts: Dict[str, str] = {}
+        self._dirty = set()
+        self._control: Optional[Deb822] = None
+
+
+    def read(self, name: str) -> str:
+        """读取文件内容, 不存在时为空"""
+        if name not in self._texts:
+            file = self._path.joinpath(name)
+            self._texts[name] = file.read_text() if file.exists() else ""
+        return self._texts[name]
+
+
+    def write(self, name: str, text: str) -> None:
+        self._texts[name] = text
+        self._dirty.add(name)
+
+
+    def append(self, name: str, lines: List[str]) -> None:
+        """在文件末尾追加若干行(与 echo >> 的结果一致)"""
+        self.write(name, self.read(name) + "\n".join(lines) + "\n")
+
+
+    def replace(self, name: str, old: str, new: str) -> None:
+        self.write(name, self.read(name).replace(old, new))
+
+
+    @property
+    def control(self) -> Deb822:
+        if self._control is None:
+            self._control = Deb822(self.read("control"))
+        return self._control
+
+
+    def add_prefix(self, prefix: str) -> None:
+        """为源码包、二进制包以及 changelog 第一条记录的包名加上前缀"""
+        self.control.add_prefix("Source", f"{prefix}-")
+        self.control.add_prefix("Package", f"{prefix}-")
+        self._dirty.add("control")
+        lines = self.read("changelog").split("\n", 1)
+        name, sep, rest = lines[0].partition(" (")
+        if sep and name and not any(c.isspace() for c in name):
+            lines[0] = f"{prefix}-{name}{sep}{rest}"
+            self.write("changelog", "\n".join(lines))
+
+
+    def set_arch(self, arch: str) -> None:
+        self.control.set("Architecture", arch)
+        self._dirty.add("control")
 
 
+    def save(self) -> None:
+        if self._control is not None:
+            self._texts["control"] = str(self._control)
+        for name in sorted(self._dirty):
+            file = self._path.joinpath(name)
+            file.write_text(self._texts[name])
+            if name in self.EXECUTABLES:
+                file.chmod(file.stat().st_mode | 0o111)
+        self._dirty.clear()
+
+
+class DebianGenerationError(RuntimeError):
+    """本地生成 debian/ 失败(rosdep 键无法解析、不支持的构建类型等), 调用方回退到 bloom-generate"""
+
+
+_ROS1_DISTROS = {"kinetic", "lunar", "melodic", "noetic"}
+
+
+def detect_os() -> Tuple[str, str]:
+    """读取 /etc/os-release, 返回系统名与版本代号(如 ubuntu, focal), 与 rosdep 的检测结果一致"""
+    info = {}
+    with open("/etc/os-release", "r", encoding="utf-8") as f:
+        for line in f:
+            key, _, value = line.strip().partition("=")
+            info[key] = value.strip('"')
+    return info.get("ID", ""), info.get("VERSION_CODENAME", "")
+
+
+def _load_yaml(path) -> Any:
+    import yaml
+    with open(path, "r", encoding="utf-8") as f:
+        return yaml.load(f, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
+
+
+class RosdepResolver:
+    """
+    rosdep 键解析
+
+    按 sources.list.d 中的顺序加载本地 yaml 源, 同一个键以先出现的源为准; 未命中时再查询 ROSDISTRO_INDEX_URL
+    指向的本地 rosdistro 中已发布的功能包, 与 rosdep 的解析顺序一致.
+
+    解析结果按发行版与系统预先编译成按键排序的文本表(每行 "键\t包名..."), 通过 mmap 二分查找, 不必再解析 yaml;
+    表头记录所有源内容的哈希, 任一源变化时重新编译
+    """
+
+    SOURCES_DIR = Path("/etc/ros/rosdep/sources.list.d")
+    INSTALLERS = {"apt", "pip", "source", "gem", "npm", "snap"}
+    DEFAULT_CACHE_DIR = Path("~/.cache/gen_deb/rosdep").expanduser()
+
+
+    def __init__(self, ros_distro: str, os_name: Optional[str]=None, os_version: Optional[str]=None,
+                 sources: Optional[List[str]]=None, cache_dir: Optional[str]=None, use_cache: bool=True) -> None:
+        self._ros_distro = ros_distro
+        if not (os_name and os_version):
+            detected = detect_os()
+            os_name, os_version = os_name or detected[0], os_version or detected[1]
+        self.os_name, self.os_version = os_name, os_version
+        self._sources = self.yaml_sources() if sources is None else list(sources)
+        self._rules: Optional[dict] = None
+        self._released: Optional[set] = None
+        self._table = None
+        self._table_start = 0
+        if use_cache:
+            cache_dir = Path(cache_dir).expanduser() if cache_dir else self.DEFAULT_CACHE_DIR
+            self._open_table(cache_dir.joinpath(f"{ros_distro}-{os_name}-{os_version}.db"))
+
+
+    def yaml_sources(self) -> List[str]:
+        """sources.list.d 中配置的本地 yaml 源(按文件名排序), 带系统标签时只保留当前系统的源"""
+        sources = []
+        for list_file in sorted(self.SOURCES_DIR.glob("*.list")):
+            for line in list_file.read_text().splitlines():
+                parts = line.split()
+                if len(parts) < 2 or parts[0] != "yaml" or not parts[1].startswith("file://"):
+                    continue
+                if len(parts) > 2 and self.os_name not in parts[2:]:
+                    continue
+                sources.append(parts[1][len("file://"):])
+        return sources
+
+
+    def distribution_file(self) -> Optional[Path]:
+        """ROSDISTRO_INDEX_URL 指向的本地 rosdistro 中当前发行版的 distribution.yaml"""
+        index_url = os.environ.get("ROSDISTRO_INDEX_URL", "")
+        if not index_url.startswith("file://"):
+            return None
+        distribution = Path(index_url[len("file://"):]).parent.joinpath(self._ros_distro, "distribution.yaml")
+        return distribution if distribution.exists() else None
+
+
+    def digest(self) -> str:
+        """发行版、系统以及所有源内容的哈希"""
+        digest = hashlib.sha256(f"{VERSION} {self._ros_distro} {self.os_name} {self.os_version}".encode())
+        distribution = self.distribution_file()
+        for source in self._sources + ([str(distribution)] if distribution else []):
+            digest.update(f"\0{source}\0".encode())
+            if os.path.isfile(source):
+                hash_file(source, digest)
+        return digest.hexdigest()
+
+
+    def rules(self) -> dict:
+        """合并后的 yaml 规则, 同一个键以先出现的源为准"""
+        if self._rules is None:
+            rules = {}
+            for source in self._sources:
+                for key, rule in (_load_yaml(source) or {}).items():
+                    rules.setdefault(key, rule)
+            self._rules = rules
+        return self._rules
+
+
+    def released_packages(self) -> set:
+        """本地 rosdistro 中当前发行版已发布的功能包"""
+        if self._released is None:
+            released = set()
+            distribution = self.distribution_file()
+            if distribution is not None:
+                for name, repo in ((_load_yaml(distribution) or {}).get("repositories") or {}).items():
+                    release = (repo or {}).get("release") or {}
+                    if release.get("version"):
+                        released.update(release.get("packages", [name]))
+            self._released = released
+        return self._released
+
+
+    def _rule_packages(self, key: str) -> Optional[List[str]]:
+        rule = self.rules().get(key)
+        if not isinstance(rule, dict) or self.os_name not in rule:
+            return None
+        rule = rule[self.os_name]
+        if isinstance(rule, dict) and not set(rule) & self.INSTALLERS:
+            # 按系统版本区分的规则
+            if self.os_version in rule:
+                rule = rule[self.os_version]
+            elif "*" in rule:
+                rule = rule["*"]
+            else:
+                return None
+        if isinstance(rule, dict):
+            if "apt" not in rule:
+                raise DebianGenerationError(f"rosdep 键 {key} 不是 apt 依赖: {sorted(rule)}")
+            rule = rule["apt"]
+            rule = rule.get("packages") if isinstance(rule, dict) else rule
+        if rule is None:
+            return []
+        return rule.split() if isinstance(rule, str) else list(rule)
+
+
+    def _resolve_sources(self, key: str) -> List[str]:
+        packages = self._rule_packages(key)
+        if packages is not None:
+            return packages
+        if key in self.released_packages():
+            return [f"ros-{self._ros_distro}-{key.replace('_', '-')}"]
+        raise DebianGenerationError(f"无法解析 rosdep 键: {key}")
+
+
+    def compile(self) -> str:
+        """
+        编译所有键的解析结果
+
+        Returns:
+            str: 按键排序的文本表, 无法作为 apt 依赖解析的键以 "!" 开头记录原因, 未收录的键视为无法解析
+        """
+        lines = []
+        for key in sorted(set(map(str, self.rules())) | self.released_packages(), key=str.encode):
+            try:
+                value = " ".join(self._resolve_sources(key))
+            except DebianGenerationError as e:
+                value = f"!{e}"
+            lines.append(f"{key}\t{value}\n")
+        return "".join(lines)
+
+
+    def _open_table(self, table_file: Path) -> None:
+        import mmap
+        header = f"gen_deb-rosdep {self.digest()}\n".encode()
+        try:
+            with open(table_file, "rb") as f:
+                current = f.readline() == header
+        except FileNotFoundError:
+            current = False
+        if not current:
+            start = time.perf_counter()
+            table_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp = table_file.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_bytes(header + self.compile().encode())
+            tmp.replace(table_file)
+            logger.info(f"🗂  Compiled rosdep table {table_file} in {time.perf_counter() - start:.2f}s")
+        with open(table_file, "rb") as f:
+            self._table = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._table_start = len(header)
+
+
+    def _lookup(self, key: str) -> Optional[str]:
+        """在编译后的表中二分查找, lo 始终位于行首"""
+        table, needle = self._table, key.encode()
+        lo, hi = self._table_start, len(table)
+        while lo < hi:
+            start = max(table.rfind(b"\n", lo, (lo + hi) // 2) + 1, lo)
+            end = table.find(b"\n", start)
+            name, _, value = table[start:end].partition(b"\t")
+            if name == needle:
+                return value.decode()
+            if name < needle:
+                lo = end + 1
+            else:
+                hi = start
+        return None
+
+
+    def resolve(self, key: str) -> List[str]:
+        """将 rosdep 键解析为 deb 包名"""
+        if self._table is None:
+            return self._resolve_sources(key)
+        value = self._lookup(key)
+        if value is None:
+            raise DebianGenerationError(f"无法解析 rosdep 键: {key}")
+        if value.startswith("!"):
+            raise DebianGenerationError(value[1:])
+        return value.split()
+
+
+def _debianize_string(value: str) -> str:
+    value = re.sub(r"<.*?>", "", value)
+    value = re.sub(r"\s+", " ", value)
+    return value.strip()
+
+
+def _format_description(value: str) -> str:
+    value = _debianize_string(value)
+    parts = value.split(". ", 1)
+    if len(parts) == 1 or len(parts[1]) == 0:
+        return value
+    return f"{parts[0]}.\n {parts[1].strip()}"
+
+
+def _format_multiline(value: str) -> str:
+    if value.startswith("\n"):
+        value = "." + value
+    if value.endswith("\n"):
+        value = value + "."
+    value = value.replace("\n\n", "\n.\n")
+    value = value.replace("\n\n", "\n.\n")
+    return value.replace("\n", "\n ")
+
+
+def _format_depends(depends, resolved: Dict[str, List[str]]) -> List[str]:
+    versions = {"version_lt": "<<", "version_lte": "<=", "version_eq": "=", "version_gte": ">=", "version_gt": ">>"}
+    formatted = []
+    for dep in depends:
+        for resolved_dep in resolved[dep.name]:
+            constraints = [k for k in versions if getattr(dep, k, None) is not None]
+            if not constraints:
+                formatted.append(resolved_dep)
+            for k in constraints:
+                formatted.append(f"{resolved_dep} ({versions[k]} {getattr(dep, k)})")
+    return formatted
+
+
+def _rfc_2822_date(date) -> str:
+    from email.utils import formatdate
+    return formatdate(float(date.strftime("%s")), date.tzinfo)
+
+
+def _version_tuple(version: str) -> Tuple[int, ...]:
+    return tuple(int(part) for part in version.split("."))
+
+
+class NativeDebianGenerator:
+    """
+    进程内生成 debian/, 代替 bloom-generate rosdebian
+
+    使用已安装的 bloom 自带的模板, 替换变量按 bloom 的规则从 package.xml 计算, 输出与 bloom-generate 一致.
+    rosdep 键通过整个工作空间共用的 RosdepResolver 解析, 不再为每个功能包启动 bloom 并重新加载 rosdep 数据
+    """
+
+    TEMPLATE_EXTENSION = ".em"
+
+
+    def __init__(self, ros_distro: str, resolver: Optional[RosdepResolver]=None) -> None:
+        self._ros_distro = ros_distro
+        self._resolver = resolver or RosdepResolver(ros_distro)
+        self._templates = self.template_root()
+        if self._templates is None:
+            raise DebianGenerationError("未找到 bloom 模板或 empy")
+
+
+    @staticmethod
+    def template_root() -> Optional[Path]:
+        """已安装的 bloom 中 debian 模板的目录, bloom 或 empy 未安装时返回 None"""
+        import importlib.util
+        spec = importlib.util.find_spec("bloom")
+        if spec is None or not spec.submodule_search_locations or importlib.util.find_spec("em") is None:
+            return None
+        root = Path(list(spec.submodule_search_locations)[0], "generators", "debian", "templates")
+        return root if root.is_dir() else None
+
+
+    def _conditional_context(self) -> Dict[str, str]:
+        return {
+            "ROS_VERSION": "1" if self._ros_distro in _ROS1_DISTROS else "2",
+            "ROS_DISTRO": self._ros_distro,
+            "ROS_PYTHON_VERSION": "3",
+        }
+
+
+    def _changelogs(self, package) -> list:
+        from catkin_pkg.changelog import CHANGELOG_FILENAME, get_changelog_from_path
+
+        maintainer = package.maintainers[0]
+        name = f'"{maintainer.name}"' if maintainer.name and maintainer.name[0] != '"' else maintainer.name
+        changelogs = []
+        changelog_path = Path(package.filename).parent.joinpath(CHANGELOG_FILENAME)
+        if changelog_path.exists():
+            for version, date, changes in get_changelog_from_path(str(changelog_path)).foreach_version(reverse=True):
+                lines = []
+                for item in changes:
+                    lines.extend("  " + line for line in str(item).splitlines())
+                changelogs.append((version, _rfc_2822_date(date), "\n".join(lines), name, maintainer.email))
+        if package.version not in [entry[0] for entry in changelogs]:
+            import datetime
+            changelogs.insert(0, (
+                package.version,
+                _rfc_2822_date(datetime.datetime.now()),
+                "  * Autogenerated, no changelog for this version found in CHANGELOG.rst.",
+                name,
+                maintainer.email,
+            ))
+        # bloom 在这两种情况下会交互式地询问是否继续, 这里交给 bloom 处理
+        if changelogs[0][0] != package.version or \
+                any(_version_tuple(package.version) < _version_tuple(entry[0]) for entry in changelogs):
+            raise DebianGenerationError(f"{package.name} 的 CHANGELOG.rst 与版本号 {package.version} 不一致")
+        return changelogs
+
+
+    def substitutions(self, package, deb_inc: str="0") -> dict:
+        """计算模板替换变量, 与 bloom 的 generate_substitutions_from_package(rosdebian) 一致"""
+        import datetime
+        from catkin_pkg.package import Person
+
+        if package.package_format >= 3:
+            package.evaluate_conditions(self._conditional_context())
+
+        def active(deps):
+            return [dep for dep in deps if dep.evaluated_condition is not False]
+
+        depends = active(package.run_depends + package.buildtool_export_depends)
+        build_depends = active(package.build_depends + package.buildtool_depends)
+        test_depends = active(package.test_depends)
+        replaces = active(package.replaces)
+        conflicts = active(package.conflicts)
+        resolved = {dep.name: self._resolver.resolve(dep.name)
+                    for dep in depends + build_depends + test_depends + replaces + conflicts}
+
+        pass_install_scripts = True
+        setup_cfg = Path(package.filename).parent.joinpath("setup.cfg")
+        if setup_cfg.is_file():
+            from configparser import ConfigParser
+            config = ConfigParser()
+            config.read([str(setup_cfg)])
+            if config.has_option("install", "install-scripts") or config.has_option("install", "install_scripts"):
+                pass_install_scripts = False
+
+        def urls(url_type):
+            return [str(url) for url in package.urls if url.type == url_type]
+
+        maintainers = [str(Person(f'"{m.name}"', m.email) if m.name and m.name[0] != '"' else m)
+                       for m in package.maintainers]
+        licenses = []
+        for lic in package.licenses:
+            if getattr(lic, "file", None) is not None:
+                license_file = Path(package.filename).parent.joinpath(lic.file)
+                if not license_file.exists():
+                    raise DebianGenerationError(f"License file '{license_file}' is not found.")
+                licenses.append((str(lic), _format_multiline(license_file.read_text().rstrip())))
+            else:
+                licenses.append((str(lic), "See repository for full license text"))
+
+        stamp = datetime.datetime.now().astimezone()
+        return {
+            "Name": package.name,
+            "Version": package.version,
+            "Description": _format_description(package.description),
+            "Homepage": (urls("website") or [f"https://index.ros.org/p/{package.name}/#{self._ros_distro}"])[0],
+            "Source": (urls("repository") or [""])[0],
+            "BugTracker": (urls("bugtracker") or [""])[0],
+            "DebianInc": f"-{deb_inc}",
+            "format": "quilt",
+            "Package": f"ros-{self._ros_distro}-{package.name.replace('_', '-')}",
+            "InstallationPrefix": f"/opt/ros/{self._ros_distro}",
+            "Depends": sorted(set(_format_depends(depends, resolved))),
+            "BuildDepends": sorted(set(_format_depends(build_depends, resolved)) |
+                                   set(p + " <!nocheck>" for p in _format_depends(test_depends, resolved))),
+            "Replaces": sorted(set(_format_depends(replaces, resolved))),
+            "Conflicts": sorted(set(_format_depends(conflicts, resolved))),
+            "pass_install_scripts": pass_install_scripts,
+            "Distribution": self._resolver.os_version,
+            "Date": stamp.strftime("%a, %d %b %Y %T %z"),
+            "YYYY": stamp.strftime("%Y"),
+            "Maintainer": maintainers[0],
+            "Maintainers": ", ".join(maintainers),
+            "changelogs": self._changelogs(package),
+            "debhelper_version": 7 if self._resolver.os_version in ["oneiric"] else 9,
+            "Licenses": licenses,
+        }
+
+
+    @staticmethod
+    def _expand(template: str, subs: dict) -> str:
+        import em
+        if em.__version__.startswith("3"):
+            return em.expand(template, **subs)
+        return em.expand(template, locals=dict(subs))
+
+
+    def _render(self, src: Path, dst: Path, subs: dict) -> None:
+        dst.mkdir(parents=True, exist_ok=True)
+        for template in sorted(src.iterdir()):
+            if template.name == "gbp.conf.em":
+                continue
+            if template.is_dir():
+                self._render(template, dst.joinpath(template.name), subs)
+                continue
+            if template.suffix != self.TEMPLATE_EXTENSION:
+                shutil.copy2(template, dst.joinpath(template.name))
+                continue
+            result = self._expand(template.read_text(encoding="utf-8"), subs)
+            output = dst.joinpath(template.stem)
+            # bloom 不写入空的 copyright
+            if not result and output.name == "copyright":
+                continue
+            output.write_text(result, encoding="utf-8")
+            shutil.copymode(template, output)
+
+
+    def generate(self, pkg_path: str, deb_inc: Optional[str]=None) -> None:
+        """
+        为功能包生成 debian/
+
+        Args:
+            pkg_path (str): 功能包路径
+            deb_inc (Optional[str]): debian 版本增量, 与 bloom-generate --debian-inc 相同, 默认为 0
+        """
+        from catkin_pkg.package import parse_package
+
+        # package.xml 解析失败(InvalidPackage)、模板展开出错(empy 的 NameError 等)都交给 bloom-generate 处理
+        try:
+            package = parse_package(pkg_path)
+            src = self._templates.joinpath(package.get_build_type())
+            if not src.is_dir():
+                raise DebianGenerationError(f"bloom 不支持构建类型 {package.get_build_type()}")
+            self._render(src, Path(pkg_path, "debian"), self.substitutions(package, deb_inc or "0"))
+        except DebianGenerationError:
+            raise
+        except Exception as e:
+            raise DebianGenerationError(f"生成 {pkg_path}/debian 失败: {type(e).__name__}: {e}") from e
+
 
 class ROSPackageBuilder:
 
 
-    def __init__(self, pkg:PackageInfo) -> None:
+    def __init__(self, pkg:PackageInfo, index: Optional[WorkspaceIndex]=None) -> None:
         self.__pkg = pkg
+        self.__index = index
+        self.__debian = DebianEditor(Path(pkg.abs_path).joinpath("debian"))
         self.deb_path, self.deb_name = None, None
+        self.dbgsym_path, self.dbgsym_name = None, None
 
 
-    def build(self, prefix: str="zj-humanoid", arch: str="all", local_build: bool=False):
+    def build(self, prefix: str="zj-humanoid", arch: str="all", local_build: bool=False, cache: Optional[BuildCache]=None, dep_debs: List[str]=(),
+              planner: Optional[ResourcePlanner]=None, ccache: Optional[CompilerCache]=None,
+              debian_generator: Optional[NativeDebianGenerator]=None, sysroot: Optional[BuildSysroot]=None,
+              build_env: Optional[Dict[str, str]]=None, profile: Optional[BuildProfile]=None, split_debug: bool=False):
         logger.info(f"📦 Building package: {self.__pkg.name} at {self.__pkg.abs_path}")
 
-        self.clear()
-        with local.cwd(self.__pkg.abs_path):
-
-            logger.info("🛠  Generating debian package...")
-            if os.environ.get("IS_TAG_TRIGGER") == "true" or local_build:        # 打tag的时候云端也上传 tag名称就是v1.0.0等
-            # TODO 根据构建的规则进行生成，是否要生成一个时间戳
-                bloom_generate["rosdebian", "--ros-distro", f"{ROS_VERSION}", "--unsafe"]()
-            else:
-                bloom_generate["rosdebian", "--ros-distro", f"{ROS_VERSION}", "--debian-inc", f"{get_branch_info()}", "--unsafe"]()
+        # 并行构建时各线程共用进程 cwd, 所以所有命令都显式绑定功能包目录而不是使用 local.cwd
+        pkg_path = self.__pkg.abs_path
+        debian_inc = None
+        if not (os.environ.get("IS_TAG_TRIGGER") == "true" or local_build):      # 打tag的时候云端也上传 tag名称就是v1.0.0等
+            debian_inc = self.__index.branch_info(self.__pkg) if self.__index else get_branch_info(pkg_path)
+
+        spans = self.__pkg.spans
+        cache_key = None
+        if cache is not None:
+            with timed(spans, "cache"):
+                source_hash = self.__index.source_hash(self.__pkg) if self.__index else None
+                cache_key = cache.key(self.__pkg, list(dep_debs), prefix, arch, debian_inc is not None, source_hash=source_hash,
+                                      profile=profile, split_debug=split_debug)
+                entry = cache.get(cache_key)
+            if entry is not None:
+                logger.info(f"♻️  Cache hit, reusing {entry['file']} (keeps the version it was built with)")
+                self.deb_name = entry["file"]
+                self.deb_path = str(Path(pkg_path).joinpath("..", self.deb_name))
+                self.__pkg.deb_name = entry["package"]
+                shutil.copy2(entry["path"], self.deb_path)
+                if entry.get("dbgsym_path"):
+                    self.dbgsym_name = entry["dbgsym"]
+                    self.dbgsym_path = str(Path(pkg_path).joinpath("..", self.dbgsym_name))
+                    shutil.copy2(entry["dbgsym_path"], self.dbgsym_path)
+                return
 
-            logger.info("🛠  Modifying debian/rules...")
-            self.modify_debian_rules()
+        with timed(spans, "clear"):
+            self.clear()
+
+        logger.info("🛠  Generating debian package...")
+        generated = False
+        if debian_generator is not None:
+            with timed(spans, "debian-generate"):
+                try:
+                    debian_generator.generate(pkg_path, debian_inc)
+                    generated = True
+                except DebianGenerationError as e:
+                    logger.warning(f"⚠️  {e}, 回退到 bloom-generate")
+                    shutil.rmtree(Path(pkg_path).joinpath("debian"), ignore_errors=True)
+        if not generated:
+            with timed(spans, "bloom-generate"):
+                if debian_inc is None:
+                # TODO 根据构建的规则进行生成，是否要生成一个时间戳
+                    bloom_generate["rosdebian", "--ros-distro", f"{ROS_VERSION}", "--unsafe"].with_cwd(pkg_path)()
+                else:
+                    bloom_generate["rosdebian", "--ros-distro", f"{ROS_VERSION}", "--debian-inc", f"{debian_inc}", "--unsafe"].with_cwd(pkg_path)()
+
+        logger.info("🛠  Modifying debian/rules...")
+        with timed(spans, "modify-debian"):
+            # 修改在内存中完成, 最后每个文件只写一次
+            self.__debian = DebianEditor(Path(pkg_path).joinpath("debian"))
+            self.modify_debian_rules(ccache_dir=ccache.dir if ccache else None, sysroot_dir=sysroot.root if sysroot else None,
+                                     profile=profile, split_debug=split_debug)
             self.modify_deb_name(prefix)
 
             if self.is_data_package():
                 self.modify_deb_arch(arch="all")
-                logger.info("📦 Detected data package, modifying debian/postrm and debian/postinst...")
-                self.postinst()
-                self.postrm()
-
-            logger.info("📦 Building debian package...")
-            # TODO 判断当前系统的CPU核心数量，如果超过10核的情况下 在根据实际情况是否要进行多核编译
-            with local.env(DEB_BUILD_OPTIONS="parallel=4 nocheck"):
-                fakeroot["debian/rules", "binary"] & FG
+                logger.info("📦 Detected data package, adding zj_humanoid namespace links...")
+                self.namespace_links()
+            self.__debian.save()
+
+        logger.info("📦 Building debian package...")
+        planner = planner or ResourcePlanner()
+        with planner.slot(self.__pkg.name) as build_jobs, timed(spans, "debian/rules binary"):
+            self.__pkg.build_jobs = build_jobs
+            fakeroot["debian/rules", "binary"].with_cwd(pkg_path).with_env(**(build_env or {}), DEB_BUILD_OPTIONS=f"parallel={build_jobs} nocheck") & FG
+        # dh_builddeb 是 binary 的最后一步, 从 rules 记录的开始时间到此即为打包(压缩)耗时
+        builddeb_start = Path(pkg_path).joinpath("debian", ".builddeb-start")
+        if builddeb_start.exists():
+            start = float(builddeb_start.read_text())
+            spans.append(Span(name="dh_builddeb", start=start, duration=time.time() - start,
+                              thread=threading.current_thread().name))
         self.get_deb_info()
-        self.clear()
+        with timed(spans, "clear"):
+            self.clear()
+        if cache is not None:
+            with timed(spans, "cache"):
+                cache.put(cache_key, self.deb_path, self.__pkg.deb_name, dbgsym_path=self.dbgsym_path)
 
 
     def clear(self):
-        with local.cwd(self.__pkg.abs_path):
-            logger.info("🧹 Removing old debian and build directories...")
-            sudo["rm", "-rf", "debian", ".obj-x86_64-linux-gnu", "obj-x86_64-linux-gnu"]()
+        logger.info("🧹 Removing old debian and build directories...")
+        sudo["rm", "-rf", "debian", ".obj-x86_64-linux-gnu", "obj-x86_64-linux-gnu"].with_cwd(self.__pkg.abs_path)()
 
     
     def modify_deb_name(self, prefix: str="zj-humanoid", suffix: str=None):
-        sed["-i", f"s/^Source: /Source: {prefix}-/", "debian/control"]()
-        sed["-i", f"s/^Package: /Package: {prefix}-/", "debian/control"]()
-        # sed["-i", f"1s/^\(\S\+\) (/$(echo \"{prefix}-\1\") (/", "debian/changelog"]()
-        sed["-i", f"1s/^\\(\\S\\+\\) (/{prefix}-\\1 (/", "debian/changelog"]()
+        self.__debian.add_prefix(prefix)
 
 
     def modify_deb_arch(self, arch: str="all"):
-        sed["-i", f"s/^Architecture: .*/Architecture: {arch}/", "debian/control"]()
-
-
-    def install(self):
-        sudo["apt-get", "install", "-y", "--allow-downgrades", self.deb_path] & FG
-
+        self.__debian.set_arch(arch)
 
 
-    def uninstall(self):
-        sudo["apt-get", "purge", "-y", self.__pkg.deb_name] & FG
-    
-
-
-    def modify_debian_rules(self):
+    def modify_debian_rules(self, ccache_dir: Optional[str]=None, sysroot_dir: Optional[Path]=None,
+                            profile: Optional[BuildProfile]=None, split_debug: bool=False):
         raw_context = [
-            "",
-            "override_dh_strip:",
-            "	true",
             "",
             "override_dh_shlibdeps:",
             "	true",
         ]
-        context = "\n".join(raw_context)
-        (echo[f"{context}"] >> "debian/rules")()
+        if not split_debug:
+            # 拆分时由 dh_strip 剥离二进制, 并自动生成按 build-id 组织调试符号的 -dbgsym 包
+            raw_context = ["", "override_dh_strip:", "	true"] + raw_context
+        if ccache_dir:
+            # 通过 ccache 的编译器软链接目录接管 gcc/g++, 兼容不支持 CMAKE_<LANG>_COMPILER_LAUNCHER 环境变量的旧版 CMake
+            # BASEDIR 让缓存键使用相对路径, 不同容器中挂载位置不同的工作空间也能命中
+            raw_context += [
+                "",
+                "export PATH := /usr/lib/ccache:$(PATH)",
+                f"export CCACHE_DIR := {ccache_dir}",
+                f"export CCACHE_BASEDIR := {self.__pkg.abs_path}",
+                "export CCACHE_NOHASHDIR := 1",
+            ]
+        if profile:
+            for step in profile.skip:
+                raw_context += ["", f"override_{step}:", "	true"]
+        raw_context += ["", "override_dh_builddeb:"]
+        if sysroot_dir:
+            # 二进制中的路径(RPATH 等)无法还原, 产物仍引用解包目录时构建失败, 避免打出在目标机器上不可用的包
+            raw_context += [
+                f"	if grep -rlF '{sysroot_dir}' debian/*/; then \\",
+                f"		echo 'error: files above still reference the isolated build sysroot {sysroot_dir}, build without --isolated' >&2; \\",
+                "		exit 1; \\",
+                "	fi",
+            ]
+        raw_context += [
+            "	date +%s.%N > debian/.builddeb-start",
+            "	dh_builddeb" + (" -- " + " ".join(profile.builddeb_args()) if profile else ""),
+        ]
+        self.__debian.append("rules", raw_context)
         # 开启多核编译
-        context = Path("debian/rules").read_text().replace("dh $@ -v", "dh $@ -v --parallel")
-        Path("debian/rules").write_text(context)
+        self.__debian.replace("rules", "dh $@ -v", "dh $@ -v --parallel")
+        if sysroot_dir:
+            self.relocate_installed(sysroot_dir)
+
+
+    def relocate_installed(self, sysroot_dir: Path):
+        """
+        隔离构建时安装的文件(CMake 配置、.pc 等)中可能带有依赖解包目录的路径, 在 dh_auto_install 之后立即还原为实际安装路径,
+        早于 dh_md5sums 生成校验和. bloom 生成的 rules 已经定义了 override_dh_auto_install(加载 setup.sh), 追加在其中
+        """
+        relocate = f"	grep -rlIZF '{sysroot_dir}' debian/*/ | xargs -0r sed -i 's|{sysroot_dir}/[^/]*||g'"
+        rules = self.__debian.read("rules")
+        if re.search(r"^override_dh_auto_install:", rules, re.M) and "\n\tdh_auto_install\n" in rules:
+            self.__debian.replace("rules", "\n\tdh_auto_install\n", f"\n\tdh_auto_install\n{relocate}\n")
+        else:
+            self.__debian.append("rules", ["", "override_dh_auto_install:", "	dh_auto_install", relocate])
     
 
-    def postrm(self):
-        PKG = self.__pkg.name
-        raw_context = [
-            "",
-            f"_PATH_INCLUDE_PKG=/opt/ros/noetic/include/zj_humanoid/{PKG}",
-            f"_PATH_PYTHON3_PKG=/opt/ros/noetic/lib/python3/dist-packages/zj_humanoid/{PKG}",
-            "",
-            "echo \"Removing directory: $_PATH_INCLUDE_PKG\"",
-            "rm -rf \"$_PATH_INCLUDE_PKG\"",
-            "echo \"Removing directory: $_PATH_PYTHON3_PKG\"",
-            "rm -rf \"$_PATH_PYTHON3_PKG\"",
-            "",
-            "_PATH_INCLUDE=\"/opt/ros/noetic/include/zj_humanoid\"",
-            "_PATH_PYTHON3=\"/opt/ros/noetic/lib/python3/dist-packages/zj_humanoid\"",
-            "",
-            "# 判断第一个文件夹是否为空，如果是则删除",
-            "if [ -d \"$_PATH_INCLUDE\" ]; then",
-            "    # 检查目录是否为空（仅包含隐藏文件也视为空）",
-            "    if [ -z \"$(ls -A \"$_PATH_INCLUDE\")\" ]; then",
-            "        echo \"Removing empty include directory: $_PATH_INCLUDE\"",
-            "        rm -rf \"$_PATH_INCLUDE\"",
-            "    fi",
-            "fi",
-            "",
-            "# 判断第二个文件夹是否只包含__init__.py且没有其他文件/文件夹",
-            "if [ -d \"$_PATH_PYTHON3\" ]; then",
-            "    # 获取目录下所有文件和文件夹（包括隐藏文件）",
-            "    contents=$(ls -A \"$_PATH_PYTHON3\")",
-            "    # 检查是否只有__init__.py一个文件",
-            "    if [ \"$contents\" = \"__init__.py\" ] && [ -f \"$_PATH_PYTHON3/__init__.py\" ]; then",
-            "        echo \"Removing python directory with only __init__.py: $_PATH_PYTHON3\"",
-            "        rm -rf \"$_PATH_PYTHON3\"",
-            "    fi",
-            "fi",
-        ]
-        context = "\n".join(raw_context)
-        (echo[f"{context}"] >> "debian/postrm")()
-        chmod["+x", "debian/postrm"]()
+    # 数据包的头文件与 Python 模块在 zj_humanoid 命名空间下的入口
+    NAMESPACE_DIRS = ("/opt/ros/noetic/include", "/opt/ros/noetic/lib/python3/dist-packages")
 
 
-    def postinst(self):
+    def namespace_links(self):
+        """
+        打包时在 deb 中生成 zj_humanoid/<功能包> -> ../<功能包> 的相对软链接, 代替安装时复制、卸载时删除.
+        软链接在 dpkg 的文件清单中, 卸载时由 dpkg 删除; zj_humanoid 作为 Python 隐式命名空间包, 不再需要共用的 __init__.py
+        """
         PKG = self.__pkg.name
-        raw_context = [
-            "mkdir -p /opt/ros/noetic/include/zj_humanoid",
-            "mkdir -p /opt/ros/noetic/lib/python3/dist-packages/zj_humanoid",
-            f"echo Installing directory: /opt/ros/noetic/include/zj_humanoid/{PKG}",
-            f"cp -r /opt/ros/noetic/include/{PKG} /opt/ros/noetic/include/zj_humanoid/{PKG}",
-            f"echo Installing directory: /opt/ros/noetic/lib/python3/dist-packages/zj_humanoid/{PKG}",
-            f"cp -r /opt/ros/noetic/lib/python3/dist-packages/{PKG} /opt/ros/noetic/lib/python3/dist-packages/zj_humanoid/{PKG}",
-            "touch /opt/ros/noetic/lib/python3/dist-packages/zj_humanoid/__init__.py"
-        ]
-        context = "\n".join(raw_context)
-        (echo[f"{context}"] >> "debian/postinst")()
-        chmod["+x", "debian/postinst"]()
+        package = self.__debian.control.get("Package", paragraph=1)
+        dirs = " ".join(self.NAMESPACE_DIRS)
+        self.__debian.append("rules", [
+            "",
+            "override_dh_link:",
+            "	dh_link",
+            f"	for dir in {dirs}; do \\",
+            f"		if [ -d debian/{package}$$dir/{PKG} ]; then \\",
+            f"			mkdir -p debian/{package}$$dir/zj_humanoid && ln -sfn ../{PKG} debian/{package}$$dir/zj_humanoid/{PKG}; \\",
+            "		fi; \\",
+            "	done",
+        ])
+        # 从复制方式的旧版本升级时, 旧版本的 postrm 在新文件解包后执行, 会删掉同名的软链接, 在这里补回
+        self.__debian.append("postinst", ([] if self.__debian.read("postinst") else ["#!/bin/sh", "set -e", ""]) + [
+            "if [ \"$1\" = configure ]; then",
+            f"    for dir in {dirs}; do",
+            f"        if [ -d \"$dir/{PKG}\" ] && [ ! -L \"$dir/zj_humanoid/{PKG}\" ]; then",
+            f"            rm -rf \"$dir/zj_humanoid/{PKG}\"",
+            f"            mkdir -p \"$dir/zj_humanoid\" && ln -s ../{PKG} \"$dir/zj_humanoid/{PKG}\"",
+            "        fi",
+            "    done",
+            "fi",
+        ])
 
 
     def is_data_package(self):  
         # TODO 判断是否为数据包
+        if self.__index is not None:
+            return self.__index.is_data_package(self.__pkg)
         is_have_msg = len(list(Path(self.__pkg.abs_path).rglob("*.msg")))
         is_have_srv = len(list(Path(self.__pkg.abs_path).rglob("*.srv")))
         is_have_action = len(list(Path(self.__pkg.abs_path).rglob("*.action")))
@@ -262,20 +1810,90 @@ class ROSPackageBuilder:
 
 
     def get_deb_info(self):
-        text = Path(self.__pkg.abs_path).joinpath("debian", "files").read_text()
-        self.deb_name = text.split(" ")[0]
-        self.deb_path = str(Path(self.__pkg.abs_path).joinpath("..", self.deb_name))
+        # debian/files 每行一个产物, dh_strip 自动生成的调试符号包带有 automatic=yes 标记
+        for line in Path(self.__pkg.abs_path).joinpath("debian", "files").read_text().splitlines():
+            fields = line.split(" ")
+            path = str(Path(self.__pkg.abs_path).joinpath("..", fields[0]))
+            if "automatic=yes" in fields:
+                self.dbgsym_name, self.dbgsym_path = fields[0], path
+            elif fields[0].endswith(".deb"):
+                self.deb_name, self.deb_path = fields[0], path
         text = Path(self.__pkg.abs_path).joinpath("debian", "control").read_text()
         for line in text.split("\n"):
             if line.startswith("Package:"):
                 self.__pkg.deb_name = line.split(" ")[1]
 
     def mv(self, dest_path:Path):
-        dest_path.mkdir(parents=True, exist_ok=True)
-        Path(self.deb_path).rename(dest_path.joinpath(self.deb_name))
+        with timed(self.__pkg.spans, "mv"):
+            dest_path.mkdir(parents=True, exist_ok=True)
+            Path(self.deb_path).rename(dest_path.joinpath(self.deb_name))
+            self.__pkg.deb_size = dest_path.joinpath(self.deb_name).stat().st_size
+            if self.dbgsym_path:
+                # 调试符号包单独存放, 不随运行时 deb 分发到机器人
+                dbgsym_dir = dest_path.joinpath("dbgsym")
+                dbgsym_dir.mkdir(exist_ok=True)
+                Path(self.dbgsym_path).rename(dbgsym_dir.joinpath(self.dbgsym_name))
+                self.__pkg.dbgsym_name = str(dbgsym_dir.joinpath(self.dbgsym_name))
         return dest_path.joinpath(self.deb_name)
 
 
+class BuildScheduler:
+    """按依赖关系并行构建功能包, 依赖的功能包构建并安装完成后才会开始构建"""
+
+
+    def __init__(self, packages: List[PackageInfo], jobs: int=1, planner: Optional[ResourcePlanner]=None) -> None:
+        self._packages = packages
+        self._jobs = max(1, int(jobs))
+        self._planner = planner
+        names = {pkg.name for pkg in packages}
+        # 只保留本次构建范围内的依赖(例如 selected_package 时依赖可能已经安装在系统中)
+        self._depends = {pkg.name: {dep for dep in pkg.depends if dep in names} for pkg in packages}
+
+
+    def run(self, build_one) -> None:
+        """
+        执行构建
+
+        Args:
+            build_one (Callable[[PackageInfo], None]): 构建并安装单个功能包
+        """
+        if self._jobs == 1:
+            for pkg in self._packages:
+                build_one(pkg)
+            return
+
+        pending = list(self._packages)          # 保持拓扑顺序, 优先调度靠前的包
+        done = set()
+        running = {}
+        error = None
+        with ThreadPoolExecutor(max_workers=self._jobs) as executor:
+            while pending or running:
+                ready = []
+                if error is None:
+                    ready = [pkg for pkg in pending if self._depends[pkg.name] <= done][:self._jobs - len(running)]
+                if self._planner is not None:
+                    # 先告知本轮的并发数再提交, 同一批的包按相同的份额分配 CPU
+                    self._planner.schedule(len(running) + len(ready))
+                for pkg in ready:
+                    pending.remove(pkg)
+                    running[executor.submit(build_one, pkg)] = pkg
+                if not running:
+                    break
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    pkg = running.pop(future)
+                    if future.exception() is not None:
+                        # 出错后不再调度新的包, 等待正在构建的包结束
+                        logger.error(f"功能包 {pkg.name} 构建失败: {future.exception()}")
+                        error = error or future.exception()
+                    else:
+                        done.add(pkg.name)
+        if error is not None:
+            raise error
+        if pending:
+            raise RuntimeError(f"存在无法满足的依赖: {[pkg.name for pkg in pending]}")
+
+
 class RosDebCli:
 
 
@@ -284,29 +1902,50 @@ class RosDebCli:
         self._packages = PackgesInfo()
 
 
-    def __call__(self, workspace: str, prefix: str="zj-humanoid", arch: str="all", local_build: bool=False, selected_package: Optional[str]=None) -> None:
+    def __call__(self, workspace: str, prefix: str="zj-humanoid", arch: str="all", local_build: bool=False, selected_package: Optional[str]=None, jobs: int=1, no_cache: bool=False, cache_dir: Optional[str]=None, cache_size: float=10.0,
+                 since: Optional[str]=None, changed_only: bool=False, build_jobs: int=0, mem_per_job: float=1.5,
+                 ccache: bool=True, ccache_dir: Optional[str]=None, native_debian: bool=False, isolated: bool=False,
+                 profile: Optional[str]=None, split_debug: bool=False) -> None:
+        require_ros_version()
         self._local_build = local_build
+        previous = PackgesInfo.load()
+        if changed_only and since is None:
+            # 未指定 ref 时与上一次构建的提交进行比较
+            if previous is None or not previous.commit_hash:
+                logger.warning("未找到上一次构建记录 /tmp/deb.json, 执行完整构建")
+            else:
+                since = previous.commit_hash
 
         if not self._local_build:
             if not is_git_repo(workspace):
                 logger.error(f"工作空间路径 {workspace} 不是一个有效的 Git 仓库，请确保在 Git 仓库中运行，或者使用 --local_build 参数进行本地构建")
                 exit(1)
-            with local.cwd(workspace):
-                self._packages = PackgesInfo(
-                    branch_name  = git("rev-parse", "--abbrev-ref", "HEAD").strip().replace("/", "").replace("_", ""),
-                    commit_count = git("rev-list", "--count", "HEAD").strip(),
-                    commit_hash  = git("log", "-1", "--format=%h").strip()
-                )
-        self.build(workspace=workspace, prefix=prefix, arch=arch, selected_package=selected_package)
-
-
-    def build(self, workspace: str, prefix: str="zj-humanoid", arch: str="all", selected_package: Optional[str]=None) -> None:
+            branch_name, commit_count, commit_hash = get_git_info(workspace)
+            self._packages = PackgesInfo(branch_name=branch_name, commit_count=commit_count, commit_hash=commit_hash)
+        self.build(workspace=workspace, prefix=prefix, arch=arch, selected_package=selected_package, jobs=jobs,
+                   no_cache=no_cache, cache_dir=cache_dir, cache_size=cache_size, since=since, previous=previous,
+                   build_jobs=build_jobs, mem_per_job=mem_per_job, ccache=ccache, ccache_dir=ccache_dir,
+                   native_debian=native_debian, isolated=isolated, profile=profile, split_debug=split_debug)
+
+
+    def build(self, workspace: str, prefix: str="zj-humanoid", arch: str="all", selected_package: Optional[str]=None, jobs: int=1,
+              no_cache: bool=False, cache_dir: Optional[str]=None, cache_size: float=10.0,
+              since: Optional[str]=None, previous: Optional[PackgesInfo]=None, build_jobs: int=0, mem_per_job: float=1.5,
+              ccache: bool=True, ccache_dir: Optional[str]=None, native_debian: bool=False, isolated: bool=False,
+              profile: Optional[str]=None, split_debug: bool=False) -> None:
+        require_ros_version()
+        # 未指定时使用 dpkg-deb 的默认压缩(xz -6), 与原有构建一致; release 的 xz -9 -Sextreme 更慢且每个进程占用更多内存
+        if profile is not None and profile not in BUILD_PROFILES:
+            raise ValueError(f"未知的打包配置: {profile}, 可选: {', '.join(BUILD_PROFILES)}")
+        self._packages.build_profile = profile or ""
         sudo["su"]()
         workspace_path = Path(workspace).expanduser().resolve()
         if not workspace_path.exists():
             raise FileNotFoundError(f"工作空间路径不存在: {workspace_path}")
 
-        packages = get_workspace_packages(workspace_path)
+        with timed(self._packages.spans, "get_workspace_packages"):
+            index = WorkspaceIndex(workspace_path)
+            packages = index.packages()
         if not packages:
             logger.warning(f"未在 {workspace_path} 下找到可构建的包")
             return
@@ -317,26 +1956,228 @@ class RosDebCli:
                 logger.error(f"未找到指定包: {selected_package}")
                 return
 
-        builders: List[ROSPackageBuilder] = []
-        for pkg in packages:
-            pkg:PackageInfo
-            builder = ROSPackageBuilder(pkg)
-            builders.append(builder)
-            builder.build(prefix=prefix, arch=arch)
-            builder.install()
-            deb_name = builder.mv(workspace_path.joinpath("dist").resolve())
-            pkg.deb_name = str(deb_name)
-            self._packages.packages.append(pkg)
-            
-
-        for builder in reversed(builders):
-            builder.uninstall()
+        dist_path = workspace_path.joinpath("dist").resolve()
+        carried = {}
+        if since:
+            carried = self.get_carried_packages(workspace_path, dist_path, packages, since, previous)
+            for pkg in carried.values():
+                pkg.spans = []          # 耗时属于上一次构建
+        all_packages, packages = packages, [pkg for pkg in packages if pkg.name not in carried]
+
+        builders = {pkg.name: ROSPackageBuilder(pkg, index) for pkg in packages}
+        cache = None if no_cache else BuildCache(cache_dir, max_size_gb=cache_size)
+        planner = ResourcePlanner(jobs=build_jobs, mem_per_job_gb=mem_per_job)
+        compiler_cache = None
+        if ccache:
+            if CompilerCache.available():
+                compiler_cache = CompilerCache(ccache_dir)
+            else:
+                logger.warning("未找到 ccache, 跳过编译缓存")
+        debian_generator = None
+        if native_debian:
+            # rosdep 数据只加载一次, 所有功能包共用
+            try:
+                debian_generator = NativeDebianGenerator(ROS_VERSION)
+            except DebianGenerationError as e:
+                logger.warning(f"⚠️  {e}, 使用 bloom-generate")
+        dist_debs = {name: pkg.deb_name for name, pkg in carried.items()}
+
+        # 构建依赖通过 dist/ 下的本地 apt 源按需安装, 隔离构建时改为解包到 dist/.sysroot, 沿用的功能包同样加入
+        dist_path.mkdir(parents=True, exist_ok=True)
+        repo = BuildSysroot(dist_path, f"/opt/ros/{ROS_VERSION}") if isolated else LocalAptRepo(dist_path)
+        repo.open()
+        for name, pkg in carried.items():
+            repo.add(name, pkg.deb_name)
+        depends = {pkg.name: pkg.depends for pkg in all_packages}
+
+        def closure(name: str) -> List[str]:
+            """工作空间内的传递依赖, apt 安装时由 apt 解析, 隔离构建时需要全部叠加"""
+            result, stack = [], list(depends[name])
+            while stack:
+                dep = stack.pop()
+                if dep not in result:
+                    result.append(dep)
+                    stack.extend(depends.get(dep, []))
+            return result
+
+        def build_one(pkg: PackageInfo):
+            builder = builders[pkg.name]
+            dep_debs = [dist_debs[dep] for dep in pkg.depends if dep in dist_debs]
+            build_env = None
+            if isolated:
+                with timed(pkg.spans, "sysroot"):
+                    build_env = repo.env(closure(pkg.name))
+            else:
+                with timed(pkg.spans, "install"):
+                    repo.install(pkg.depends)
+            builder.build(prefix=prefix, arch=arch, local_build=self._local_build, cache=cache, dep_debs=dep_debs,
+                          planner=planner, ccache=compiler_cache, debian_generator=debian_generator,
+                          sysroot=repo if isolated else None, build_env=build_env, profile=BUILD_PROFILES[profile] if profile else None,
+                          split_debug=split_debug)
+            deb_name = builder.mv(dist_path)
+            dist_debs[pkg.name] = pkg.deb_name = str(deb_name)
+            with timed(pkg.spans, "index"):
+                repo.add(pkg.name, pkg.deb_name)
+
+        try:
+            BuildScheduler(packages, jobs=jobs, planner=planner).run(build_one)
+            # 按拓扑顺序记录结果, 与完成顺序无关, 保证并行与串行输出一致
+            self._packages.packages.extend(carried.get(pkg.name, pkg) for pkg in all_packages)
+        finally:
+            if not isolated:
+                with timed(self._packages.spans, "uninstall"):
+                    repo.purge()
+            repo.close()
+
+        if cache is not None:
+            logger.info(f"♻️  Build cache: {cache.hits} hit(s), {cache.misses} miss(es)")
+        if compiler_cache is not None:
+            compiler_cache.report()
 
 
         # 在这里生成临时json文件
         self._packages.dump()
 
+
+    def resolve(self, *keys: str, cache_dir: Optional[str]=None) -> None:
+        """
+        编译 rosdep 解析表(源未变化时直接复用)并输出给定键的解析结果, 可在镜像构建时预先执行
+
+        Args:
+            keys (str): rosdep 键
+            cache_dir (Optional[str]): 解析表目录, 默认 ~/.cache/gen_deb/rosdep
+        """
+        resolver = RosdepResolver(require_ros_version(), cache_dir=cache_dir)
+        for key in keys:
+            try:
+                print(f"{key}: {' '.join(resolver.resolve(key))}")
+            except DebianGenerationError as e:
+                print(f"{key}: ❌ {e}")
+
+
+    def plan(self, status: str="/var/lib/dpkg/status", file: str="/tmp/deb.json", remote_dir: Optional[str]=None) -> None:
+        """
+        对比目标机器的 dpkg 状态与构建记录, 按拓扑顺序每行输出一个需要更新的 deb, 可直接传给 chfs install_many
+
+        Args:
+            status (str): 目标机器的 dpkg status 文件, 可以是拷贝到本地的副本
+            file (str): 构建生成的 JSON 文件
+            remote_dir (Optional[str]): chfs 上存放本次 deb 的目录, 指定时输出远程路径, 否则输出本地路径
+        """
+        info = PackgesInfo.load(file)
+        if info is None:
+            logger.error(f"未找到构建记录: {file}")
+            return
+        plan = plan_update(info.packages, read_dpkg_status(status))
+        logger.info(f"🚚 {len(plan)}/{len(info.packages)} 个功能包需要更新")
+        for pkg in plan:
+            print(f"{remote_dir.rstrip('/')}/{Path(pkg.deb_name).name}" if remote_dir else pkg.deb_name)
+
+
+    def profile(self, file: str="/tmp/deb.json", trace: Optional[str]="/tmp/deb.trace.json") -> None:
+        """
+        根据构建记录输出各功能包耗时与关键路径, 并生成 Chrome Trace 文件(chrome://tracing 或 Perfetto 打开)
+
+        Args:
+            file (str): 构建生成的 JSON 文件
+            trace (Optional[str]): Chrome Trace JSON 输出路径, 为空时不生成
+        """
+        info = PackgesInfo.load(file)
+        if info is None:
+            logger.error(f"未找到构建记录: {file}")
+            return
+
+        packages = {pkg.name: pkg for pkg in info.packages if pkg.spans}
+        # 每个功能包的耗时取其第一个阶段开始到最后一个阶段结束
+        elapsed = {
+            name: max(s.start + s.duration for s in pkg.spans) - min(s.start for s in pkg.spans)
+            for name, pkg in packages.items()
+        }
+
+        print(f"{'package':<40}{'total':>10}{'deb':>12}  phases")
+        for name in sorted(elapsed, key=elapsed.get, reverse=True):
+            phases = {}
+            for span in packages[name].spans:
+                phases[span.name] = phases.get(span.name, 0.0) + span.duration
+            detail = ", ".join(f"{k}={v:.1f}s" for k, v in sorted(phases.items(), key=lambda kv: -kv[1]))
+            jobs = f" (parallel={packages[name].build_jobs})" if packages[name].build_jobs else ""
+            size = packages[name].deb_size
+            size = f"{size / 1024:.0f}K" if size is not None else "-"
+            print(f"{name:<40}{elapsed[name]:>9.1f}s{size:>12}  {detail}{jobs}")
+        for span in info.spans:
+            print(f"{'[' + span.name + ']':<40}{span.duration:>9.1f}s")
+
+        # 打包配置的取舍: deb 总大小与压缩耗时(dh_builddeb 包含在 debian/rules binary 中)
+        total_size = sum(pkg.deb_size or 0 for pkg in packages.values())
+        builddeb = sum(span.duration for pkg in packages.values() for span in pkg.spans if span.name == "dh_builddeb")
+        print(f"\n打包配置 {info.build_profile or '-'}: deb 共 {total_size / 1024 / 1024:.1f}M, dh_builddeb 共 {builddeb:.1f}s")
+
+        # 关键路径: 沿依赖关系累加耗时最长的一条链路, 决定了并行构建的下限
+        finish, via = {}, {}
+        for pkg in info.packages:
+            if pkg.name not in packages:
+                continue
+            deps = [dep for dep in pkg.depends if dep in finish]
+            prev = max(deps, key=finish.get) if deps else None
+            finish[pkg.name] = elapsed[pkg.name] + (finish[prev] if prev else 0.0)
+            via[pkg.name] = prev
+        if finish:
+            node, path = max(finish, key=finish.get), []
+            total = finish[node]
+            while node:
+                path.append(node)
+                node = via[node]
+            print(f"\n关键路径 ({total:.1f}s): {' -> '.join(reversed(path))}")
+
+        if trace:
+            spans = [(pkg.name, span) for pkg in info.packages for span in pkg.spans]
+            spans += [("workspace", span) for span in info.spans]
+            origin = min((span.start for _, span in spans), default=0.0)
+            events = [{
+                "name": span.name,
+                "cat": name,
+                "ph": "X",
+                "ts": int((span.start - origin) * 1e6),
+                "dur": int(span.duration * 1e6),
+                "pid": 0,
+                "tid": span.thread,
+                "args": {"package": name},
+            } for name, span in spans]
+            with open(trace, "w", encoding="utf-8") as f:
+                json.dump({"traceEvents": events}, f, indent=4, ensure_ascii=False)
+            print(f"Chrome Trace 已写入 {trace}")
+
+
+    @staticmethod
+    def get_carried_packages(workspace_path: Path, dist_path: Path, packages: List[PackageInfo], since: str,
+                             previous: Optional[PackgesInfo]) -> dict:
+        """
+        计算可以沿用上一次构建结果的功能包
+
+        Args:
+            workspace_path (Path): 工作空间路径
+            dist_path (Path): deb 输出目录
+            packages (List[PackageInfo]): 按拓扑顺序排列的功能包
+            since (str): 比较的 git ref
+            previous (Optional[PackgesInfo]): 上一次构建记录
+
+        Returns:
+            dict: 功能包名 -> 上一次构建的 PackageInfo
+        """
+        affected = get_affected_packages(packages, get_changed_files(workspace_path, since))
+        logger.info(f"🔍 Changed since {since}: {affected}")
+        carried = {}
+        for pkg in (previous.packages if previous else []):
+            # 只沿用仍存在于当前 dist/ 中的 deb
+            if pkg.name in affected or not pkg.deb_name or Path(pkg.deb_name).parent != dist_path:
+                continue
+            if Path(pkg.deb_name).exists():
+                carried[pkg.name] = pkg
+        names = {pkg.name for pkg in packages}
+        return {name: pkg for name, pkg in carried.items() if name in names}
+
 # /tmp/deb.json json文件
 
 if __name__ == "__main__":
+    import fire
     fire.Fire(RosDebCli())
@@ -0,0 +1,28 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+FIXTURES = ROOT.joinpath("tests", "fixtures")
+
+sys.path.insert(0, str(ROOT.joinpath("scripts")))
+
+# (ros 发行版, 系统代号, 包名), 对应 fixtures/<发行版>/<包名>, 其中 debian/ 由 bloom-generate rosdebian 生成
+PACKAGES = [
+    ("noetic", "focal", "zj_demo"),
+    ("humble", "jammy", "zj_msgs"),
+]
+
+
+def read_tree(path: Path) -> dict:
+    """读取目录下所有文件, 返回 相对路径 -> (内容, 是否可执行)"""
+    return {
+        str(file.relative_to(path)): (file.read_bytes(), bool(file.stat().st_mode & 0o111))
+        for file in sorted(path.rglob("*")) if file.is_file()
+    }
+
+
+@pytest.fixture(params=PACKAGES, ids=[distro for distro, _, _ in PACKAGES])
+def bloom_package(request):
+    return request.param
@@ -0,0 +1,20 @@
+from pathlib import Path
+
+from gen_deb import PackageInfo, get_affected_packages
+
+
+def package(root: Path, name: str, depends=()) -> PackageInfo:
+    return PackageInfo(name=name, path=name, version="1.0.0", abs_path=str(root.joinpath(name)), depends=list(depends))
+
+
+def test_exec_depend_chain_out_of_order(tmp_path):
+    """a -> b -> c 只通过 exec_depend 关联时, catkin 的拓扑顺序可能把被依赖者排在后面"""
+    packages = [package(tmp_path, "a", ["b"]), package(tmp_path, "b", ["c"]), package(tmp_path, "c")]
+    changed = [tmp_path.joinpath("c", "src", "main.cpp")]
+    assert get_affected_packages(packages, changed) == ["a", "b", "c"]
+
+
+def test_nested_package_and_unrelated(tmp_path):
+    packages = [package(tmp_path, "a"), package(tmp_path, "a/inner"), package(tmp_path, "d", ["a"])]
+    changed = [tmp_path.joinpath("a", "inner", "package.xml")]
+    assert get_affected_packages(packages, changed) == ["a/inner"]
@@ -0,0 +1,41 @@
+import shutil
+
+import pytest
+
+from conftest import FIXTURES
+from gen_deb import BuildCache, PackageInfo
+
+
+@pytest.fixture
+def package(tmp_path):
+    path = tmp_path.joinpath("zj_demo")
+    shutil.copytree(FIXTURES.joinpath("noetic", "zj_demo"), path, ignore=shutil.ignore_patterns("debian"))
+    return PackageInfo(name="zj_demo", path="zj_demo", version="1.2.0", abs_path=str(path))
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return BuildCache(str(tmp_path.joinpath("cache")))
+
+
+def test_key_ignores_commit(cache, package):
+    """分支构建的每次提交都会改变 debian 版本增量, 但源码不变时应命中缓存"""
+    assert cache.key(package, [], "zj-humanoid", "all", True) == cache.key(package, [], "zj-humanoid", "all", True)
+    assert cache.key(package, [], "zj-humanoid", "all", True) != cache.key(package, [], "zj-humanoid", "all", False)
+
+
+def test_key_tracks_source(cache, package):
+    before = cache.key(package, [], "zj-humanoid", "all", True)
+    with open(f"{package.abs_path}/CHANGELOG.rst", "a") as file:
+        file.write("\n")
+    assert cache.key(package, [], "zj-humanoid", "all", True) != before
+
+
+def test_hit_reuses_built_deb(cache, package, tmp_path):
+    deb = tmp_path.joinpath("zj-humanoid-ros-noetic-zj-demo_1.2.0-0master+3-abc123focal_all.deb")
+    deb.write_bytes(b"deb")
+    key = cache.key(package, [], "zj-humanoid", "all", True)
+    cache.put(key, str(deb), "zj-humanoid-ros-noetic-zj-demo")
+    entry = cache.get(cache.key(package, [], "zj-humanoid", "all", True))
+    assert entry["file"] == deb.name
+    assert open(entry["path"], "rb").read() == b"deb"
@@ -0,0 +1,73 @@
+import shutil
+import subprocess
+
+import pytest
+
+from conftest import FIXTURES, read_tree
+from gen_deb import Deb822, DebianEditor
+
+PREFIX = "zj-humanoid"
+
+
+@pytest.fixture
+def debian(bloom_package, tmp_path):
+    distro, _, name = bloom_package
+    path = tmp_path.joinpath("debian")
+    shutil.copytree(FIXTURES.joinpath(distro, name, "debian"), path)
+    return path
+
+
+def sed(path, *scripts):
+    """原 gen_deb 用 sed 修改 debian/, 作为对照"""
+    for script, name in scripts:
+        subprocess.run(["sed", "-i", script, str(path.joinpath(name))], check=True)
+
+
+def test_control_roundtrip(debian):
+    text = debian.joinpath("control").read_text()
+    assert str(Deb822(text)) == text
+
+
+def test_save_untouched_is_byte_identical(debian):
+    before = read_tree(debian)
+    editor = DebianEditor(debian)
+    editor.read("changelog")
+    editor.control
+    editor.save()
+    assert read_tree(debian) == before
+
+
+@pytest.mark.skipif(shutil.which("sed") is None, reason="需要 sed")
+def test_add_prefix(debian, tmp_path, bloom_package):
+    distro = bloom_package[0]
+    expected = tmp_path.joinpath("expected")
+    shutil.copytree(debian, expected)
+    sed(expected,
+        (f"s/^Source: /Source: {PREFIX}-/", "control"),
+        (f"s/^Package: /Package: {PREFIX}-/", "control"),
+        (f"1s/^\\(\\S\\+\\) (/{PREFIX}-\\1 (/", "changelog"))
+
+    editor = DebianEditor(debian)
+    editor.add_prefix(PREFIX)
+    editor.save()
+
+    assert read_tree(debian) == read_tree(expected)
+    control = Deb822(debian.joinpath("control").read_text())
+    assert control.get("Source").startswith(f"{PREFIX}-ros-{distro}-")
+    assert all(paragraph_name.startswith(f"{PREFIX}-ros-{distro}-")
+               for paragraph_name in (control.get("Package", i) for i in range(1, len(control.paragraphs))))
+    assert debian.joinpath("changelog").read_text().startswith(f"{PREFIX}-ros-{distro}-")
+
+
+@pytest.mark.skipif(shutil.which("sed") is None, reason="需要 sed")
+def test_set_arch(debian, tmp_path):
+    expected = tmp_path.joinpath("expected")
+    shutil.copytree(debian, expected)
+    sed(expected, ("s/^Architecture: .*/Architecture: all/", "control"))
+
+    editor = DebianEditor(debian)
+    editor.set_arch("all")
+    editor.save()
+
+    assert read_tree(debian) == read_tree(expected)
+    assert Deb822(debian.joinpath("control").read_text()).get("Architecture", 1) == "all"
@@ -0,0 +1,41 @@
+import shutil
+import subprocess
+
+import pytest
+
+from conftest import FIXTURES
+from gen_deb import PackageInfo, ROSPackageBuilder
+
+pytestmark = pytest.mark.skipif(shutil.which("make") is None, reason="需要 make")
+
+
+@pytest.fixture
+def package(bloom_package, tmp_path):
+    distro, _, name = bloom_package
+    path = tmp_path.joinpath(name)
+    shutil.copytree(FIXTURES.joinpath(distro, name), path)
+    return path
+
+
+def recipe(package, target: str) -> list:
+    """make -n 输出的目标命令"""
+    result = subprocess.run(["make", "-n", "-s", "-f", "debian/rules", target], cwd=package, check=True,
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, universal_newlines=True)
+    return result.stdout.splitlines()
+
+
+def test_isolated_rewrites_before_md5sums(package, tmp_path):
+    sysroot = tmp_path.joinpath("dist", ".sysroot")
+    builder = ROSPackageBuilder(PackageInfo(name=package.name, path=package.name, version="", abs_path=str(package)))
+    builder.modify_debian_rules(sysroot_dir=sysroot)
+    builder._ROSPackageBuilder__debian.save()
+
+    install = recipe(package, "override_dh_auto_install")
+    # 保留 bloom 的 override_dh_auto_install(加载 setup.sh), 在 dh_auto_install 之后还原路径
+    assert any(". \"/opt/ros/" in line for line in install)
+    assert install[-2] == "dh_auto_install"
+    assert install[-1].startswith(f"grep -rlIZF '{sysroot}'") and "sed -i" in install[-1]
+
+    builddeb = recipe(package, "override_dh_builddeb")
+    assert not any("sed -i" in line for line in builddeb)
+    assert any(f"grep -rlF '{sysroot}'" in line for line in builddeb)
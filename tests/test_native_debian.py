@@ -0,0 +1,51 @@
+import shutil
+
+import pytest
+
+from conftest import FIXTURES, read_tree
+from gen_deb import DebianGenerationError, NativeDebianGenerator, RosdepResolver
+
+pytestmark = [
+    pytest.mark.skipif(NativeDebianGenerator.template_root() is None, reason="需要 bloom 与 empy"),
+    pytest.mark.filterwarnings("ignore::DeprecationWarning"),
+]
+
+
+def generator(distro: str, codename: str) -> NativeDebianGenerator:
+    pytest.importorskip("catkin_pkg")
+    resolver = RosdepResolver(distro, "ubuntu", codename, sources=[str(FIXTURES.joinpath("rosdep.yaml"))],
+                              use_cache=False)
+    return NativeDebianGenerator(distro, resolver)
+
+
+@pytest.fixture
+def package(bloom_package, tmp_path):
+    distro, _, name = bloom_package
+    path = tmp_path.joinpath(name)
+    shutil.copytree(FIXTURES.joinpath(distro, name), path, ignore=shutil.ignore_patterns("debian"))
+    return path
+
+
+def test_matches_bloom_generate(bloom_package, package):
+    """与 bloom-generate rosdebian 的输出逐字节一致(包括 rules 的可执行权限)"""
+    distro, codename, name = bloom_package
+    generator(distro, codename).generate(str(package))
+    assert read_tree(package.joinpath("debian")) == read_tree(FIXTURES.joinpath(distro, name, "debian"))
+
+
+def test_invalid_package_xml(bloom_package, package):
+    distro, codename, _ = bloom_package
+    package.joinpath("package.xml").write_text("<package format=\"3\"><name>broken</name></package>\n")
+    with pytest.raises(DebianGenerationError):
+        generator(distro, codename).generate(str(package))
+
+
+def test_template_error(bloom_package, package, monkeypatch):
+    distro, codename, _ = bloom_package
+
+    def expand(template, subs):
+        raise NameError("name 'Undefined' is not defined")
+
+    monkeypatch.setattr(NativeDebianGenerator, "_expand", staticmethod(expand))
+    with pytest.raises(DebianGenerationError, match="NameError"):
+        generator(distro, codename).generate(str(package))
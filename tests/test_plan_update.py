@@ -0,0 +1,79 @@
+import shutil
+import subprocess
+
+import pytest
+
+from gen_deb import PackageInfo, compare_versions, plan_update, read_dpkg_status
+
+pytestmark = pytest.mark.skipif(shutil.which("dpkg") is None, reason="需要 dpkg")
+
+STATUS = """\
+Package: zj-humanoid-ros-noetic-zj-demo
+Status: install ok installed
+Architecture: amd64
+Version: 1:1.2.0-0master+3-abc123focal
+
+Package: zj-humanoid-ros-noetic-zj-msgs
+Status: install ok installed
+Architecture: amd64
+Version: 0.3.1-0focal
+
+Package: zj-humanoid-ros-noetic-zj-held
+Status: hold ok installed
+Architecture: amd64
+Version: 2.0.0-0focal
+
+Package: zj-humanoid-ros-noetic-zj-old
+Status: deinstall ok config-files
+Architecture: amd64
+Version: 0.1.0-0focal
+"""
+
+
+def package(deb_name: str) -> PackageInfo:
+    return PackageInfo(name=deb_name.split("_")[0], path="", version="", abs_path="", deb_name=deb_name)
+
+
+@pytest.fixture
+def installed(tmp_path):
+    status = tmp_path.joinpath("status")
+    status.write_text(STATUS)
+    return read_dpkg_status(str(status))
+
+
+def test_read_dpkg_status_keeps_epoch(installed):
+    assert installed == {
+        ("zj-humanoid-ros-noetic-zj-demo", "amd64"): "1:1.2.0-0master+3-abc123focal",
+        ("zj-humanoid-ros-noetic-zj-msgs", "amd64"): "0.3.1-0focal",
+        ("zj-humanoid-ros-noetic-zj-held", "amd64"): "2.0.0-0focal",
+    }
+
+
+def test_compare_versions():
+    assert compare_versions("1.0-1", "1.0-1") == 0
+    assert compare_versions("1.0~rc1-1", "1.0-1") == -1
+    assert compare_versions("1:0.9-1", "1.0-1") == 1
+    assert compare_versions("1.0-0master+10-abc", "1.0-0master+9-abc") == 1
+
+
+def test_plan_update(installed):
+    packages = [
+        package("zj-humanoid-ros-noetic-zj-demo_1.2.0-0master+3-abc123focal_amd64.deb"),
+        package("zj-humanoid-ros-noetic-zj-msgs_0.3.1-0focal_amd64.deb"),
+        package("zj-humanoid-ros-noetic-zj-old_0.1.0-0focal_amd64.deb"),
+        package("zj-humanoid-ros-noetic-zj-held_2.0.0-0focal_amd64.deb"),
+    ]
+    # 已安装版本带 epoch, 与不带 epoch 的新构建不相等; hold 的包版本一致时不重新安装
+    assert [pkg.deb_name for pkg in plan_update(packages, installed)] == [packages[0].deb_name, packages[2].deb_name]
+
+
+@pytest.mark.skipif(shutil.which("dpkg-deb") is None, reason="需要 dpkg-deb")
+def test_plan_update_reads_epoch_from_deb(installed, tmp_path):
+    tree = tmp_path.joinpath("tree", "DEBIAN")
+    tree.mkdir(parents=True)
+    tree.joinpath("control").write_text(
+        "Package: zj-humanoid-ros-noetic-zj-demo\nVersion: 1:1.2.0-0master+3-abc123focal\n"
+        "Architecture: amd64\nMaintainer: Dev Team <dev@example.com>\nDescription: demo\n")
+    deb = tmp_path.joinpath("zj-humanoid-ros-noetic-zj-demo_1.2.0-0master+3-abc123focal_amd64.deb")
+    subprocess.run(["dpkg-deb", "-b", str(tree.parent), str(deb)], check=True, stdout=subprocess.DEVNULL)
+    assert plan_update([package(str(deb))], installed) == []
@@ -0,0 +1,52 @@
+import threading
+import time
+
+import gen_deb
+from gen_deb import BuildScheduler, PackageInfo, ResourcePlanner
+
+
+def planner(monkeypatch, cpus: int, memory_gb: float, **kwargs) -> ResourcePlanner:
+    monkeypatch.setattr(gen_deb, "detect_cpu_count", lambda: cpus)
+    monkeypatch.setattr(gen_deb, "detect_memory", lambda: int(memory_gb * 1024 ** 3))
+    return ResourcePlanner(**kwargs)
+
+
+def package(name: str, depends=()) -> PackageInfo:
+    return PackageInfo(name=name, path=name, version="1.0.0", abs_path=name, depends=list(depends))
+
+
+def run(resource_planner: ResourcePlanner, packages, jobs: int) -> dict:
+    """用 BuildScheduler 调度, 记录每个包分到的并行数"""
+    result, lock = {}, threading.Lock()
+
+    def build_one(pkg):
+        with resource_planner.slot(pkg.name) as parallel:
+            with lock:
+                result[pkg.name] = parallel
+            time.sleep(0.05)
+
+    BuildScheduler(packages, jobs=jobs, planner=resource_planner).run(build_one)
+    return result
+
+
+def test_batch_shares_cpus_evenly(monkeypatch):
+    resource_planner = planner(monkeypatch, 32, 64)
+    assert run(resource_planner, [package(name) for name in "abcd"], jobs=4) == dict.fromkeys("abcd", 8)
+
+
+def test_chain_gets_whole_machine(monkeypatch):
+    """依赖链上同一时间只有一个包在编译, 每个包都使用全部 CPU"""
+    resource_planner = planner(monkeypatch, 32, 64)
+    packages = [package("c"), package("b", ["c"]), package("a", ["b"])]
+    assert run(resource_planner, packages, jobs=4) == dict.fromkeys("abc", 32)
+
+
+def test_memory_share(monkeypatch):
+    # 16G 由 4 个并发构建平分, 每个 4G, 每个编译进程 1.5G
+    resource_planner = planner(monkeypatch, 32, 16)
+    assert run(resource_planner, [package(name) for name in "abcd"], jobs=4) == dict.fromkeys("abcd", 2)
+
+
+def test_fixed_jobs(monkeypatch):
+    with planner(monkeypatch, 32, 1, jobs=12).slot("a") as parallel:
+        assert parallel == 12